@@ -1,5 +1,41 @@
-import np_workflows.experiments as experiments
-import np_workflows.shared.base_experiments as base_experiments
-import np_workflows.shared.npxc as npxc
-import np_workflows.shared.widgets as widgets
-from np_workflows.shared import *
+"""Notebook workflows for Neuropixels experiments.
+
+Everything is loaded on first attribute access (PEP 562): `import np_workflows`
+is cheap, and `np_workflows.PipelineEphys`, `np_workflows.widgets` etc. import
+only what they need.
+"""
+
+import importlib
+from typing import Any
+
+_SUBMODULES = {
+    "experiments": "np_workflows.experiments",
+    "shared": "np_workflows.shared",
+    "base_experiments": "np_workflows.shared.base_experiments",
+    "npxc": "np_workflows.shared.npxc",
+    "widgets": "np_workflows.shared.widgets",
+}
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    if name in _SUBMODULES:
+        module = globals()[name] = importlib.import_module(_SUBMODULES[name])
+        return module
+    if name != "__all__" and name.startswith("_"):
+        # private, or probed for by IPython etc.: without importing anything
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    shared = importlib.import_module("np_workflows.shared")
+    try:
+        value = getattr(shared, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    if name == "__all__":
+        value = sorted(set(value) | set(_SUBMODULES))
+    if name == "__all__" or name in vars(shared):
+        # otherwise resolved by a submodule's `__getattr__`, on each access
+        globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__getattr__("__all__")))
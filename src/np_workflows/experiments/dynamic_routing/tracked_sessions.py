@@ -0,0 +1,244 @@
+"""Add sessions to npc_lims' `tracked_sessions.yaml` without re-parsing it.
+
+The file is scanned once, line by line, for the session paths it contains and for
+the offsets where new entries are inserted. The result is cached by the file's
+mtime and size, and updated in place when entries are added, so a second save
+doesn't re-scan it. Entries are spliced in as text, so the rest of the file's
+formatting and comments are untouched.
+
+Layout assumed (as maintained in npc_lims)::
+
+    ephys:
+      DynamicRouting:
+        - <path>:
+            ephys_day: 1
+      TempletonPilotSession:      <- new DynamicRouting ephys entries go above
+        - <path>
+    behavior_with_sync:           <- new TempletonPilotSession ephys entries go above
+      ...                         <- new behavior_with_sync entries go at the end
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import pathlib
+import threading
+from collections.abc import Iterable
+
+import np_logging
+
+logger = np_logging.getLogger(__name__)
+
+BEHAVIOR_WITH_SYNC = "behavior_with_sync:"
+TEMPLETON = "TempletonPilotSession:"
+
+_lock = threading.Lock()
+_indexes: dict[pathlib.Path, TrackedSessionsIndex] = {}
+
+
+@dataclasses.dataclass(frozen=True)
+class NewSession:
+    session_type: str
+    "'ephys' or 'behavior_with_sync'"
+    project: str
+    path: str
+    "Session path, as it appears in the file."
+    snippet: str
+    "Yaml text for the entry, e.g. from `Config.to_yaml_text_snippet`."
+
+    @property
+    def text(self) -> str:
+        "Text inserted at the entry's offset."
+        return (
+            "\n"
+            + self.snippet
+            + "\n"
+            + ("  " if self.project == "DynamicRouting" else "")
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class TrackedSessionsIndex:
+    mtime_ns: int
+    size: int
+    sessions: frozenset[str]
+    "Paths of all sessions in the file, of any type or project."
+    behavior_with_sync_offset: int
+    "Offset of the first 'behavior_with_sync:', or -1."
+    templeton_offset: int
+    "Offset of the first 'TempletonPilotSession:' before 'behavior_with_sync:', or -1."
+    length: int
+    "Length of the text, in characters."
+
+    def offset(self, session: NewSession) -> int:
+        "Where `session`'s entry is inserted."
+        if session.session_type == "behavior_with_sync":
+            return self.length
+        if session.session_type != "ephys":
+            raise ValueError(f"Unknown session type: {session.session_type!r}")
+        if session.project == "TempletonPilotSession":
+            offset, marker = self.behavior_with_sync_offset, BEHAVIOR_WITH_SYNC
+        else:
+            offset, marker = self.templeton_offset, TEMPLETON
+        if offset < 0:
+            raise ValueError(f"{marker!r} not found in tracked_sessions.yaml")
+        return offset
+
+
+def _session_path(item: str) -> str:
+    "Session path from the text of a list item, following its '- '."
+    item = item.split(" #", 1)[0].strip()
+    if item.endswith(":"):
+        item = item[:-1]
+    elif ": " in item:
+        item = item.split(": ", 1)[0]
+    return item.strip().strip("'\"")
+
+
+def scan(text: str) -> tuple[set[str], int, int]:
+    """Session paths and insertion offsets, in one pass over `text`.
+
+    Session paths are the items of the lists under each `<session_type>: <project>:`,
+    indented under the project key or level with it.
+    """
+    sessions: set[str] = set()
+    behavior_offset = templeton_offset = -1
+    project_indent: int | None = None
+    item_indent: int | None = None
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if behavior_offset < 0:
+            if (i := line.find(BEHAVIOR_WITH_SYNC)) >= 0:
+                behavior_offset = offset + i
+            elif templeton_offset < 0 and (i := line.find(TEMPLETON)) >= 0:
+                templeton_offset = offset + i
+        offset += len(line)
+
+        stripped = line.lstrip()
+        if not stripped.strip() or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(stripped)
+        if indent == 0:
+            # session type
+            project_indent = item_indent = None
+        elif (
+            stripped.startswith("- ")
+            and project_indent is not None
+            and indent >= project_indent
+            and item_indent in (None, indent)
+        ):
+            # session: yaml allows a project's list at the project's own indent
+            item_indent = indent
+            sessions.add(_session_path(stripped[2:]))
+        elif project_indent is None or indent <= project_indent:
+            # project
+            project_indent, item_indent = indent, None
+    return sessions, behavior_offset, templeton_offset
+
+
+def get_index(
+    path: str | pathlib.Path, text: str | None = None
+) -> TrackedSessionsIndex:
+    """Index of the file at `path`, re-scanned only if its mtime or size changed.
+
+    Pass `text` if the file has just been read, so it isn't read again.
+    """
+    path = pathlib.Path(path)
+    stat = os.stat(path)
+    with _lock:
+        cached = _indexes.get(path)
+    if cached is not None and (cached.mtime_ns, cached.size) == (
+        stat.st_mtime_ns,
+        stat.st_size,
+    ):
+        return cached
+    if text is None:
+        text = path.read_text()
+    sessions, behavior_offset, templeton_offset = scan(text)
+    index = TrackedSessionsIndex(
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        sessions=frozenset(sessions),
+        behavior_with_sync_offset=behavior_offset,
+        templeton_offset=templeton_offset,
+        length=len(text),
+    )
+    logger.debug("Indexed %d sessions in %s", len(index.sessions), path)
+    with _lock:
+        _indexes[path] = index
+    return index
+
+
+def get_existing_sessions(path: str | pathlib.Path) -> frozenset[str]:
+    "Paths of all sessions in the file at `path`."
+    if not pathlib.Path(path).exists():
+        return frozenset()
+    return get_index(path).sessions
+
+
+def insert(text: str, index: TrackedSessionsIndex, new: Iterable[NewSession]) -> str:
+    """Add entries for `new` sessions to `text`, in one pass.
+
+    Entries sharing an offset are inserted in the order given - the same result as
+    inserting each in turn before the marker it belongs above.
+    """
+    if len(text) != index.length:
+        raise ValueError("Index is out of date for text")
+    by_offset: dict[int, list[str]] = {}
+    for session in new:
+        by_offset.setdefault(index.offset(session), []).append(session.text)
+    parts: list[str] = []
+    start = 0
+    for offset in sorted(by_offset):
+        parts.append(text[start:offset])
+        parts.extend(by_offset[offset])
+        start = offset
+    parts.append(text[start:])
+    return "".join(parts)
+
+
+def add_sessions(path: str | pathlib.Path, new: Iterable[NewSession]) -> None:
+    """Insert entries for `new` sessions into the file at `path`.
+
+    - raises `ValueError` if any are already in the file
+    - the cached index is updated, rather than discarded
+    """
+    path = pathlib.Path(path)
+    new = list(new)
+    text = path.read_text()
+    index = get_index(path, text)
+    if index.length != len(text):
+        # modified between reading and indexing
+        with _lock:
+            _indexes.pop(path, None)
+        index = get_index(path, text)
+    if duplicates := [s.path for s in new if s.path in index.sessions]:
+        raise ValueError(
+            f"The following sessions are already in {path.name}: {', '.join(duplicates)}"
+        )
+    updated = insert(text, index, new)
+    path.write_text(updated)
+
+    shift: dict[int, int] = {}
+    for session in new:
+        offset = index.offset(session)
+        shift[offset] = shift.get(offset, 0) + len(session.text)
+
+    def _shifted(offset: int) -> int:
+        if offset < 0:
+            return offset
+        # entries are inserted before the marker at their offset
+        return offset + sum(n for o, n in shift.items() if o <= offset)
+
+    stat = os.stat(path)
+    with _lock:
+        _indexes[path] = dataclasses.replace(
+            index,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            sessions=index.sessions | {s.path for s in new},
+            behavior_with_sync_offset=_shifted(index.behavior_with_sync_offset),
+            templeton_offset=_shifted(index.templeton_offset),
+            length=len(updated),
+        )
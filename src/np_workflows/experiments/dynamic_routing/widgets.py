@@ -1,25 +1,45 @@
 from __future__ import annotations
 
+import concurrent.futures
+import datetime
+import functools
 import json
 import os
 import pathlib
 import re
 import shutil
 import subprocess
+import threading
 import time
-from typing import Any, Literal, Optional, Union, get_args, get_origin
+from collections.abc import Callable
+from typing import (
+    Any,
+    Generic,
+    Literal,
+    Optional,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
 
 import IPython.display
 import ipywidgets as ipw
 import np_config
+import np_logging
 import np_services
 import np_session
 import pydantic
-import yaml
 
+import np_workflows.experiments.dynamic_routing.tracked_sessions as tracked_sessions
+import np_workflows.shared.dirwatch as dirwatch
 import np_workflows.shared.npxc as npxc
 from np_workflows.shared.base_experiments import DynamicRoutingExperiment
 
+logger = np_logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 # for widget, before creating a experiment --------------------------------------------- #
 
 
@@ -114,33 +134,17 @@ def photodoc_widget(experiment: DynamicRoutingExperiment, reminder: str) -> None
         experiment.rig.mon, np_services.config_from_zk()["ImageVimba"]["data"]
     )
 
-    def get_file_stats():
-        return {p: p.stat().st_mtime for p in vimba_dir.iterdir() if p.is_file()}
-
-    original_file_stats = get_file_stats()
-
     timeout_s = 300
     print(
         f"Take an image in Vimba Viewer and save it in {vimba_dir} with any name and .png suffix."
         f"\n\nThis cell will wait for a new file or an existing file to be modified ({timeout_s = })\n"
     )
-    t0 = time.time()
-    while True:
-        time.sleep(1)
-        new_files = len(new_file_stats := get_file_stats()) != len(original_file_stats)
-        modified_files = any(
-            p
-            for p in new_file_stats
-            if new_file_stats[p] > original_file_stats.get(p, 0)
-        )
-        if new_files or modified_files:
-            break
-
-        if time.time() - t0 > timeout_s:
-            raise TimeoutError(
-                f"No new image file detected in Vimba folder after {timeout_s} seconds - aborting"
-            )
-    latest_image = max(new_file_stats, key=lambda k: new_file_stats[k])
+    try:
+        latest_image = dirwatch.wait_for_new_file(vimba_dir, timeout_s=timeout_s)
+    except TimeoutError:
+        raise TimeoutError(
+            f"No new image file detected in Vimba folder after {timeout_s} seconds - aborting"
+        ) from None
     dest = (
         experiment.session.npexp_path
         / f"{experiment.session.npexp_path.name}_{reminder}{latest_image.suffix}"
@@ -291,9 +295,94 @@ class Config(pydantic.BaseModel):
         )
 
 
+class DebouncedSaver(Generic[T]):
+    """Write-behind saver: `submit` values as often as you like, and only the latest
+    is passed to `save`, on a background thread, at most once every `interval_s`.
+
+    - values equal to the last one saved are skipped, and passed to `on_skipped`
+    - `flush` saves the pending value immediately
+    - `last_saved` is the time of the last successful save
+    """
+
+    def __init__(
+        self,
+        save: Callable[[T], Any],
+        interval_s: float = 1.0,
+        on_saved: Callable[[T], Any] | None = None,
+        on_error: Callable[[Exception], Any] | None = None,
+        on_skipped: Callable[[T], Any] | None = None,
+    ) -> None:
+        self.save = save
+        self.interval_s = interval_s
+        self.on_saved = on_saved
+        self.on_error = on_error
+        self.on_skipped = on_skipped
+        self.last_saved: datetime.datetime | None = None
+        self.last_value: T | None = None
+        self._pending: list[T] = []
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    @property
+    def is_pending(self) -> bool:
+        return bool(self._pending)
+
+    def submit(self, value: T) -> None:
+        with self._lock:
+            self._pending[:] = [value]
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval_s, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self, raise_errors: bool = False) -> bool:
+        "Save the pending value, if any. Returns True if it was saved."
+        with self._save_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                timer, self._timer = self._timer, None
+            if timer is not None:
+                timer.cancel()
+            if not pending:
+                return False
+            value = pending[-1]
+            skipped = value == self.last_value
+            if not skipped:
+                try:
+                    self.save(value)
+                except Exception as exc:
+                    if self.on_error is not None:
+                        self.on_error(exc)
+                    if raise_errors:
+                        raise
+                    return False
+                self.last_value = value
+                self.last_saved = datetime.datetime.now()
+        if skipped:
+            # e.g. an edit reverted before it was written
+            if self.on_skipped is not None:
+                self.on_skipped(value)
+            return False
+        if self.on_saved is not None:
+            self.on_saved(value)
+        return True
+
+
+def read_saved_config(folder: str) -> dict[str, Any] | None:
+    "Contents of session_config.json in the session folder, if it exists."
+    try:
+        return json.loads(get_session_config_path(folder).read_text())
+    except FileNotFoundError:
+        return None
+
+
 class SessionConfigRow:
     """Widget row for a single session's configuration."""
 
+    autosave_interval_s: float = 1.0
+    "Minimum time between writes of session_config.json while editing."
+
     placeholders = {
         "probe_letters_to_skip": "e.g. AF",
         "surface_recording_probe_letters_to_skip": "e.g. AF",
@@ -324,11 +413,16 @@ class SessionConfigRow:
             layout=ipw.Layout(margin="0 0 4px 160px"),
         )
 
-    def __init__(self, data: dict[str, Any]):
+    def __init__(self, data: dict[str, Any], load_saved: bool = True) -> None:
+        """If not `load_saved`, the row is disabled until `apply_saved` or
+        `load_failed` is called, so a saved config can be read elsewhere (see
+        `CombinedConfigWidget.load_saved_configs`) without being overwritten."""
         self.session_folder = data["folder"]
-        config_path = get_session_config_path(self.session_folder)
-        if config_path.exists():
-            saved = json.loads(config_path.read_text())
+        self.loading = not load_saved
+        self.load_started: float | None = None
+        self._applying_saved = False
+        self._loading_lock = threading.Lock()
+        if load_saved and (saved := read_saved_config(self.session_folder)):
             data = {**data, **saved}
         self.config = Config(**data)
         self.widgets = (
@@ -379,7 +473,8 @@ class SessionConfigRow:
                         description=name,
                         placeholder=self.placeholders.get(name, ""),
                         tooltip=field.description or name,
-                        continuous_update=True,
+                        # update (and autosave) on blur or enter, not per keystroke
+                        continuous_update=False,
                         layout=ipw.Layout(width="500px"),
                         value=(
                             str(getattr(self.config, name))
@@ -392,6 +487,61 @@ class SessionConfigRow:
                 )
 
         self._setup_autosave()
+        if self.loading:
+            self._set_disabled(True)
+            self.status_label.value = (
+                '<span style="color: #888;">Loading saved config...</span>'
+            )
+
+    def _finish_loading(self) -> bool:
+        "False if loading already finished (the saved config arrived or timed out)."
+        with self._loading_lock:
+            loading, self.loading = self.loading, False
+        return loading
+
+    def _set_disabled(self, disabled: bool) -> None:
+        for widget, _label in self.widgets.values():
+            if not isinstance(widget, ipw.HTML):
+                widget.disabled = disabled
+
+    def apply_saved(self, saved: dict[str, Any] | None) -> None:
+        """Show a config read from the session folder, without autosaving it back.
+
+        Ignored if the row isn't waiting for its config (e.g. it timed out).
+        """
+        if not self._finish_loading():
+            return
+        if saved:
+            self.config = Config(**{**self.config.model_dump(), **saved})
+            self._applying_saved = True
+            try:
+                for name, (widget, _label) in self.widgets.items():
+                    if isinstance(widget, ipw.HTML):
+                        continue
+                    value = getattr(self.config, name)
+                    if isinstance(widget, ipw.Text):
+                        widget.value = str(value) if value is not None else ""
+                    elif value is None and self._is_bool_field(
+                        self.config.model_fields[name]
+                    ):
+                        widget.value = True
+                    else:
+                        widget.value = value
+            finally:
+                self._applying_saved = False
+            self.saver.last_value = self.config
+        self._set_disabled(False)
+        self.status_label.value = ""
+
+    def load_failed(self, exc: BaseException) -> None:
+        "Enable editing with defaults, warning that the saved config wasn't read."
+        if not self._finish_loading():
+            return
+        self._set_disabled(False)
+        self.status_label.value = (
+            f'<span style="color: orange;">Saved config not read ({exc!r})'
+            " — changes will overwrite it</span>"
+        )
 
     def get_config(self) -> Config:
         """Get Config object from current widget values."""
@@ -406,29 +556,77 @@ class SessionConfigRow:
         return Config(**data)
 
     def save_to_session_folder(self) -> pathlib.Path:
-        """Save current config as JSON to the session folder."""
-        config = self.get_config()
+        """Save current config as JSON to the session folder, now.
+
+        Raises `pydantic.ValidationError` or `OSError` if the config can't be saved.
+        """
+        self.saver.submit(self.get_config())
+        self.saver.flush(raise_errors=True)
+        return get_session_config_path(self.session_folder)
+
+    def flush(self) -> None:
+        "Write any pending autosave now."
+        self.saver.flush()
+
+    def _write_config(self, config: Config) -> None:
         path = get_session_config_path(self.session_folder)
         path.write_text(json.dumps(config.model_dump(), indent=2))
-        return path
 
     def _setup_autosave(self) -> None:
-        """Observe all input widgets and autosave on any change."""
-        self.status_label = ipw.HTML(value="")
-
-        def _autosave(change):
-            try:
-                self.save_to_session_folder()
-                self.status_label.value = ""
-            except pydantic.ValidationError as e:
-                msgs = "; ".join(err["msg"] for err in e.errors())
-                self.status_label.value = f'<span style="color: red;">{msgs}</span>'
-            except FileNotFoundError:
-                self.status_label.value = '<span style="color: orange;">Session folder not found on network drive — config not saved</span>'
+        """Observe all input widgets and autosave on any change.
 
+        Text fields change on blur or enter, rather than per keystroke. Changes are
+        validated immediately, but writes to the session folder are coalesced and
+        made at most every `autosave_interval_s` seconds, in the background.
+        """
+        self.status_label = ipw.HTML(value="")
+        self.saver = DebouncedSaver(
+            self._write_config,
+            interval_s=self.autosave_interval_s,
+            on_saved=self._on_saved,
+            on_error=self._on_save_error,
+            on_skipped=self._on_save_skipped,
+        )
         for widget, _label in self.widgets.values():
             if not isinstance(widget, ipw.HTML):
-                widget.observe(_autosave, names="value")
+                widget.observe(self._autosave, names="value")
+
+    def _autosave(self, change: dict[str, Any]) -> None:
+        if self._applying_saved or self.loading:
+            return
+        try:
+            config = self.get_config()
+        except pydantic.ValidationError as e:
+            msgs = "; ".join(err["msg"] for err in e.errors())
+            self.status_label.value = f'<span style="color: red;">{msgs}</span>'
+            return
+        self.saver.submit(config)
+        self.status_label.value = '<span style="color: #888;">Saving...</span>'
+
+    def _on_saved(self, config: Config) -> None:
+        if (last_saved := self.saver.last_saved) is None:
+            self.status_label.value = '<span style="color: #888;">Saved</span>'
+            return
+        saved_at = last_saved.strftime("%H:%M:%S")
+        self.status_label.value = f'<span style="color: #888;">Saved {saved_at}</span>'
+
+    def _on_save_skipped(self, config: Config) -> None:
+        # unchanged since the last save (or since it was loaded)
+        if self.saver.last_saved is not None:
+            self._on_saved(config)
+        else:
+            self.status_label.value = ""
+
+    def _on_save_error(self, exc: Exception) -> None:
+        if isinstance(exc, FileNotFoundError):
+            self.status_label.value = (
+                '<span style="color: orange;">Session folder not found on network'
+                " drive — config not saved</span>"
+            )
+        else:
+            self.status_label.value = (
+                f'<span style="color: red;">Config not saved: {exc!r}</span>'
+            )
 
     def iter_display_widgets(self):
         """Yield flat sequence of (input_widget, description_label) for display."""
@@ -440,10 +638,20 @@ class SessionConfigRow:
 
 
 class CombinedConfigWidget(ipw.VBox):
-    """Combined widget for all sessions with a single save button."""
+    """Combined widget for all sessions with a single save button.
+
+    Rows are displayed immediately, and each is filled in when its saved config has
+    been read from the network share, on a pool of `config_load_workers` threads.
+    """
+
+    config_load_workers = 8
+    config_load_timeout_s = 10.0
+    "Per file: the row is then enabled with defaults."
 
     def __init__(self, session_data_list: list[dict[str, Any]], **vbox_kwargs):
-        self.session_rows = [SessionConfigRow(data) for data in session_data_list]
+        self.session_rows = [
+            SessionConfigRow(data, load_saved=False) for data in session_data_list
+        ]
         self.console = ipw.Output()
 
         header = ipw.HTML(value="<h3>Session metadata (auto-saves)</h3>")
@@ -463,6 +671,13 @@ class CombinedConfigWidget(ipw.VBox):
         )
 
         def on_save_to_npc_lims_click(widget):
+            if self.loading_folders:
+                with self.console:
+                    print(
+                        "Saved configs are still loading - try again shortly: "
+                        + ", ".join(self.loading_folders)
+                    )
+                return
             widget.disabled = True
             with self.console:
                 for row in self.session_rows:
@@ -479,27 +694,65 @@ class CombinedConfigWidget(ipw.VBox):
             [header, widget_grid, *bottom, self.console],
             **vbox_kwargs,
         )
+        self.load_saved_configs()
+
+    @property
+    def loading_folders(self) -> list[str]:
+        "Session folders of rows whose saved config hasn't been read yet."
+        return [row.session_folder for row in self.session_rows if row.loading]
+
+    def load_saved_configs(self) -> None:
+        """Read each row's saved config in the background, filling rows in as they
+        arrive. Rows not read within `config_load_timeout_s` of being queued are
+        enabled with defaults - including rows still queued behind hung reads.
+        """
+        rows = [row for row in self.session_rows if row.loading]
+        if not rows:
+            return
 
-    def get_existing_sessions(self, yml_path: pathlib.Path) -> set[str]:
-        """Get set of existing session paths from yaml file."""
-        if not yml_path.exists():
-            return set()
+        def _read(row: SessionConfigRow) -> dict[str, Any] | None:
+            return read_saved_config(row.session_folder)
 
-        existing = yaml.safe_load(yml_path.read_text()) or {}
-        session_paths = set()
+        def _on_done(row: SessionConfigRow, future: concurrent.futures.Future) -> None:
+            if (exc := future.exception()) is not None:
+                logger.warning(
+                    "Failed to read saved config for %s: %r", row.session_folder, exc
+                )
+                row.load_failed(exc)
+            else:
+                row.apply_saved(future.result())
 
-        for session_type, project_data in existing.items():
-            if not isinstance(project_data, dict):
-                continue
-            for project, sessions in project_data.items():
-                if not isinstance(sessions, list):
-                    continue
-                for session in sessions:
-                    if isinstance(session, dict):
-                        for path in session.keys():
-                            session_paths.add(path)
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.config_load_workers, thread_name_prefix="session_config"
+        )
+        for row in rows:
+            row.load_started = time.monotonic()
+            future = executor.submit(_read, row)
+            future.add_done_callback(functools.partial(_on_done, row))
+        executor.shutdown(wait=False)
+
+        def _watchdog() -> None:
+            # a hung read on the network share can't be cancelled, but its row
+            # shouldn't stay disabled
+            while pending := [row for row in rows if row.loading]:
+                now = time.monotonic()
+                for row in pending:
+                    if (
+                        row.load_started is not None
+                        and now - row.load_started > self.config_load_timeout_s
+                    ):
+                        row.load_failed(
+                            TimeoutError(
+                                f"not read after {self.config_load_timeout_s} s"
+                            )
+                        )
+                time.sleep(0.5)
+
+        threading.Thread(target=_watchdog, name="session_config", daemon=True).start()
 
-        return session_paths
+    def get_existing_sessions(self, yml_path: pathlib.Path) -> set[str]:
+        """Get set of existing session paths from yaml file."""
+        return set(tracked_sessions.get_existing_sessions(yml_path))
 
     def save_and_push(self) -> None:
         """Save all configs to yaml and push to GitHub."""
@@ -514,6 +767,12 @@ class CombinedConfigWidget(ipw.VBox):
                         f"git clone npc_lims into {root} before trying to update tracked_sessions.yaml"
                     )
 
+                if loading := self.loading_folders:
+                    raise ValueError(
+                        f"Saved configs are still loading for: {', '.join(loading)}. "
+                        "Wait for them, so their defaults aren't pushed instead."
+                    )
+
                 existing_sessions = self.get_existing_sessions(yml_path)
                 new_configs = [row.get_config() for row in self.session_rows]
 
@@ -530,30 +789,19 @@ class CombinedConfigWidget(ipw.VBox):
                         f"To modify existing sessions, make changes directly in GitHub."
                     )
 
-                txt = yml_path.read_text()
-
-                for config in new_configs:
-                    if config.session_type == "ephys":
-                        ephys_stop = txt.find("behavior_with_sync:")
-                        if config.project == "TempletonPilotSession":
-                            stop = ephys_stop
-                        else:
-                            stop = txt[:ephys_stop].find("TempletonPilotSession:")
-                    else:
-                        assert config.session_type == "behavior_with_sync"
-                        stop = len(txt)
-
-                    txt = (
-                        txt[:stop]
-                        + "\n"
-                        + config.to_yaml_text_snippet()
-                        + "\n"
-                        + ("  " if config.project == "DynamicRouting" else "")
-                        + (txt[stop:] if stop else "\n")
-                    )
-
                 print("Updating tracked_sessions.yaml...")
-                yml_path.write_text(txt)
+                tracked_sessions.add_sessions(
+                    yml_path,
+                    (
+                        tracked_sessions.NewSession(
+                            session_type=config.session_type,
+                            project=config.project,
+                            path=f"{PROJECT_PATHS[config.project]}/{config.folder}",
+                            snippet=config.to_yaml_text_snippet(),
+                        )
+                        for config in new_configs
+                    ),
+                )
 
                 print("Committing changes...")
                 subprocess.run(
@@ -1,6 +1,5 @@
 import contextlib
 import enum
-import time
 
 import np_logging
 import np_session
@@ -16,6 +15,8 @@ from np_services import (
 )
 
 import np_workflows
+from np_workflows.shared import mtrain_view, waiters, weblog
+from np_workflows.shared.base_experiments import awaitable
 
 logger = np_logging.getLogger(__name__)
 
@@ -28,7 +29,7 @@ class P3Session(enum.Enum):
     EPHYS = "ephys"
 
 
-class P3Mixin:
+class P3Mixin(waiters.WithStimLatency):
     """Provides project-specific methods and attributes, mainly related to camstim scripts."""
 
     workflow: P3Session
@@ -95,23 +96,26 @@ class P3Mixin:
         if not SessionCamstim.is_ready_to_start():
             raise RuntimeError("SessionCamstim is not ready to start.")
 
-        np_logging.web(f"P3_{self.workflow.name.lower()}").info(
+        weblog.web(f"P3_{self.workflow.name.lower()}").info(
             f"Started session {self.mouse.mtrain.stage['name']}"
         )
         SessionCamstim.start()
 
         with contextlib.suppress(Exception):
-            while not SessionCamstim.is_ready_to_start():
-                time.sleep(2.5)
+            waiters.wait_for_stims(
+                (SessionCamstim,), max_latency_s=self.stim_max_latency_s
+            )
 
         if isinstance(SessionCamstim, Finalizable):
             SessionCamstim.finalize()
 
         with contextlib.suppress(Exception):
-            np_logging.web(f"P3_{self.workflow.name.lower()}").info(
+            weblog.web(f"P3_{self.workflow.name.lower()}").info(
                 f"Finished session {self.mouse.mtrain.stage['name']}"
             )
 
+    arun_stim = awaitable("run_stim")
+
     def copy_data_files(self) -> None:
         super().copy_data_files()
 
@@ -149,16 +153,17 @@ class P3Mixin:
 
 
 def validate_selected_workflow(session: P3Session, mouse: np_session.Mouse) -> None:
+    if (stage_name := mtrain_view.get_view(mouse).stage_name) is None:
+        raise ValueError(
+            f"MTrain stage for {mouse} not found in its regimen: please check cells above."
+        )
     for workflow in ("hab", "ephys"):
         if (
-            workflow in session.value.lower()
-            and workflow not in mouse.mtrain.stage["name"].lower()
-        ) or (
-            session.value.lower() == "ephys"
-            and "hab" in mouse.mtrain.stage["name"].lower()
-        ):
+            workflow in session.value.lower() and workflow not in stage_name.lower()
+        ) or (session.value.lower() == "ephys" and "hab" in stage_name.lower()):
             raise ValueError(
-                f"Workflow selected ({session.value}) does not match MTrain stage ({mouse.mtrain.stage['name']}): please check cells above."
+                f"Workflow selected ({session.value}) does not match MTrain stage"
+                f" ({stage_name}): please check cells above."
             )
 
 
@@ -208,7 +213,7 @@ def new_experiment(
     experiment.workflow = workflow
 
     with contextlib.suppress(Exception):
-        np_logging.web(f"P3_{experiment.workflow.name.lower()}").info(
+        weblog.web(f"P3_{experiment.workflow.name.lower()}").info(
             f"{experiment} created"
         )
 
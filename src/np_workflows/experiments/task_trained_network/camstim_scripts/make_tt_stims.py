@@ -1,4 +1,24 @@
+"""Write the .stim files for the TTN main script, one per movie.
+
+`MovieStim` loads its whole movie into memory. With `--mmap`, the .stim files
+instead memory-map the movie (`np.load(..., mmap_mode="r")`), so frames are paged
+in from disk as they're shown and only recently shown frames stay resident.
+
+`--pack` converts the movies to contiguous uint8 .npy files, which can always be
+memory-mapped, alongside a json index of each frame's offset in the file, then
+checks each packed movie against its source a chunk of frames at a time, read via
+the index (`read_frames`). With `--packed`, the .stim files use the packed movies.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
 import pathlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
 
 out_path = pathlib.Path(__file__).parent / "stims"
 movie_path = "C:\\ProgramData\\StimulusFiles\\dev\\"
@@ -19,15 +39,146 @@ paths.update(
     }
 )
 
+PACKED_SUFFIX = "_packed"
+FRAMES_PER_CHUNK = 100
+"Frames converted at a time when packing, to bound memory use."
+
+MOVIE_STIM = (
+    "MovieStim(movie_path=moviesource,window=window,frame_length=2.0/60.0,"
+    "size=(1920, 1200),start_time=0.0,stop_time=None,flip_v=True,runs=10,)"
+)
+
+
+def packed_path(path: str) -> str:
+    stem, suffix = path.rsplit(".", 1)
+    return f"{stem}{PACKED_SUFFIX}.{suffix}"
+
+
+def frame_index_path(path: str | pathlib.Path) -> pathlib.Path:
+    "Json index of frame offsets, alongside a packed movie."
+    return pathlib.Path(path).with_suffix(".frames.json")
+
+
+def pack_movie(src: str | pathlib.Path, dst: str | pathlib.Path) -> dict:
+    """Copy the movie at `src` to a contiguous uint8 .npy at `dst`, with an index.
+
+    Frames are read from a memory-map of `src` and written in chunks, so the movie
+    is never fully loaded. Non-uint8 movies must have values in 0-255.
+
+    The index (see `frame_index_path`) gives the byte offset of the first frame,
+    the size of each frame, and the frame shape, so a frame can be read with a
+    single seek.
+    """
+    import numpy as np
+
+    movie = np.load(src, mmap_mode="r")
+    packed = np.lib.format.open_memmap(
+        dst, mode="w+", dtype=np.uint8, shape=movie.shape
+    )
+    for start in range(0, len(movie), FRAMES_PER_CHUNK):
+        chunk = np.asarray(movie[start : start + FRAMES_PER_CHUNK])
+        if chunk.dtype != np.uint8:
+            if chunk.size and (chunk.min() < 0 or chunk.max() > 255):
+                raise ValueError(
+                    f"{src} has values outside 0-255: can't convert to uint8"
+                )
+            chunk = np.rint(chunk).astype(np.uint8)
+        packed[start : start + len(chunk)] = chunk
+    packed.flush()
+    index = {
+        "source": str(src),
+        "num_frames": int(movie.shape[0]),
+        "frame_shape": [int(n) for n in movie.shape[1:]],
+        "dtype": "uint8",
+        "offset": int(packed.offset),
+        "frame_bytes": int(np.prod(movie.shape[1:], dtype=np.int64)),
+    }
+    del packed
+    frame_index_path(dst).write_text(json.dumps(index, indent=2))
+    return index
+
+
+def read_frames(path: str | pathlib.Path, start: int, stop: int) -> np.ndarray:
+    """Frames `start` to `stop` of a packed movie, read with a single seek using its
+    index (see `pack_movie`), without loading or memory-mapping the whole file."""
+    import numpy as np
+
+    index = json.loads(frame_index_path(path).read_text())
+    start, stop, _ = slice(start, stop).indices(index["num_frames"])
+    count = max(stop - start, 0)
+    with open(path, "rb") as f:
+        f.seek(index["offset"] + start * index["frame_bytes"])
+        frames = np.fromfile(f, dtype=np.uint8, count=count * index["frame_bytes"])
+    return frames.reshape(count, *index["frame_shape"])
+
+
+def check_packed(src: str | pathlib.Path, dst: str | pathlib.Path) -> None:
+    "Raise `ValueError` if any frame of packed movie `dst` differs from `src`."
+    import numpy as np
+
+    movie = np.load(src, mmap_mode="r")
+    for start in range(0, len(movie), FRAMES_PER_CHUNK):
+        chunk = np.asarray(movie[start : start + FRAMES_PER_CHUNK])
+        if not np.array_equal(
+            read_frames(dst, start, start + FRAMES_PER_CHUNK),
+            np.rint(chunk).astype(np.uint8),
+        ):
+            raise ValueError(f"{dst} differs from {src} in frames from {start}")
+
+
+def stim_text(path: str, mmap: bool = False) -> str:
+    lines = [
+        "import os, shutil",
+        "import numpy as np",
+        "from camstim.misc import ImageStimNumpyuByte, checkDirs",
+        "moviesource = " + "r'" + path + "'",
+    ]
+    if not mmap:
+        return "\n".join(lines) + "\n" + "stimulus = " + MOVIE_STIM
+    lines += [
+        "# memory-map the movie instead of loading it, while MovieStim is created",
+        "_np_load = np.load",
+        "np.load = lambda *args, **kwargs: _np_load(*args, **dict(kwargs, mmap_mode='r'))",
+        "try:",
+        "    stimulus = " + MOVIE_STIM,
+        "finally:",
+        "    np.load = _np_load",
+    ]
+    return "\n".join(lines) + "\n"
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="write .stim files that memory-map their movies",
+    )
+    parser.add_argument(
+        "--packed",
+        action="store_true",
+        help="write .stim files that memory-map packed movies (see --pack)",
+    )
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="convert each movie to a packed uint8 .npy alongside it, then exit",
+    )
+    args = parser.parse_args()
+
+    if args.pack:
+        for path in sorted(set(paths.values())):
+            index = pack_movie(path, packed_path(path))
+            check_packed(path, packed_path(path))
+            print(f"{packed_path(path)}: {index['num_frames']} frames")
+        raise SystemExit
+
     out_path.mkdir(exist_ok=True, parents=True)
     for file, path in paths.items():
         with open(out_path / file, "w") as f:
-            f.write("import os, shutil\n")
-            f.write("import numpy as np\n")
-            f.write("from camstim.misc import ImageStimNumpyuByte, checkDirs\n")
-            f.write("moviesource = " + "r'" + path + "'" + "\n")
             f.write(
-                "stimulus = MovieStim(movie_path=moviesource,window=window,frame_length=2.0/60.0,size=(1920, 1200),start_time=0.0,stop_time=None,flip_v=True,runs=10,)"
+                stim_text(
+                    packed_path(path) if args.packed else path,
+                    mmap=args.mmap or args.packed,
+                )
             )
@@ -3,6 +3,7 @@ Oct'22 task-trained ephys stimuli
 """
 
 import argparse
+import copy
 import json
 
 from camstim import Foraging, MovieStim, Stimulus_v2, SweepStim_v2, Warp, Window
@@ -54,6 +55,36 @@ def package(self):
 
 MovieStim.package = package
 
+# load each stim file once
+# ----------------------------------------------------------------------------
+# the same few movies make up most of the segments: instantiating a MovieStim for
+# each would load its movie into memory again. Off unless "reuse_stims" is set in
+# the json params: sharing one instance's arrays and psychopy stim between
+# segments is untested on a Stim computer
+
+reuse_stims = json_params.get("reuse_stims", False)
+loaded_stims = {}  # type: dict
+
+
+def load_segment(stim_file):
+    """
+    Stimulus for one display-sequence segment of `stim_file`.
+
+    With `reuse_stims`, segments of the same file are copies of one instance:
+    they share its movie and psychopy stim (segments never overlap), but have
+    their own lists and dicts, such as the display sequence and sweep frames.
+    """
+    if not reuse_stims:
+        return Stimulus_v2.from_file(stim_file, window)
+    if stim_file not in loaded_stims:
+        loaded_stims[stim_file] = Stimulus_v2.from_file(stim_file, window)
+    segment = copy.copy(loaded_stims[stim_file])
+    for name, value in list(vars(segment).items()):
+        if isinstance(value, (list, dict)):
+            setattr(segment, name, copy.copy(value))
+    return segment
+
+
 # setup main stim
 # -----------------------------------------------------------------------
 # build the stimulus array with parameterized repeats & durations
@@ -91,9 +122,7 @@ cumulative_duration_sec = main_sequence_start_sec = (
     0  # if stims are daisy-chained within one script, this should be the end of the prev stim
 )
 for stim_file, duration_sec in segment_stim_secs:
-    segment = Stimulus_v2.from_file(
-        stim_file, window
-    )  # stim file actually instantiates MovieStim
+    segment = load_segment(stim_file)  # stim file actually instantiates MovieStim
     segment_ds = [(cumulative_duration_sec, cumulative_duration_sec + duration_sec)]
     segment.set_display_sequence(segment_ds)
 
@@ -11,13 +11,26 @@ by joshs@alleninstitute.org
 
 import datetime
 import logging  # must occur after camstim import for "magic"
+import os
 import pickle as pkl
+import sys
 import time
 
 import numpy as np
 from camstim.zro import agent
 from toolbox.IO.nidaq import AnalogOutput, DigitalOutput
 
+# opto_waveforms.py is copied alongside this script on Stim, or found in
+# np_workflows/shared/camstim_scripts when run from the repo
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+for _path in (
+    os.path.join(_script_dir, "..", "..", "..", "shared", "camstim_scripts"),
+    _script_dir,
+):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+import opto_waveforms
+
 # %%
 
 
@@ -101,77 +114,31 @@ def generatePulseTrain(
 
 
 def optotagging(
-    mouseID, operation_mode="experiment", level_list=[1.15, 1.28, 1.345], genotype=None
+    mouseID,
+    operation_mode="experiment",
+    level_list=[1.15, 1.28, 1.345],
+    genotype=None,
+    playback="loop",
 ):
+    """
+    playback (the "playback" key in the json params, set by the workflow from
+    `ttn_stim_config.default_ttn_params["opto"]`):
+        "loop": write each trial, then sleep for its ISI
+        "buffered": render all trials into one buffer, played under the DAQ's
+        sample clock (see `opto_waveforms.run_buffered`)
+    """
+    if playback not in ("loop", "buffered"):
+        raise ValueError("playback must be 'loop' or 'buffered': %r" % playback)
 
     sampleRate = 10000
 
-    # 1 s cosine ramp:
-    data_cosine = (
-        (
-            (
-                1
-                - np.cos(
-                    np.arange(sampleRate, dtype=np.float64) * 2 * np.pi / sampleRate
-                )
-            )
-            + 1
-        )
-        - 1
-    ) / 2  # create raised cosine waveform
-
-    # 1 ms cosine ramp:
-    rise_and_fall = (
-        (
-            (
-                1
-                - np.cos(
-                    np.arange(sampleRate * 0.001, dtype=np.float64) * 2 * np.pi / 10
-                )
-            )
-            + 1
-        )
-        - 1
-    ) / 2
-    half_length = rise_and_fall.size / 2
-
-    # pulses with cosine ramp:
-    pulse_2ms = np.concatenate(
-        (
-            rise_and_fall[:half_length],
-            np.ones((int(sampleRate * 0.001),)),
-            rise_and_fall[half_length:],
-        )
-    )
-    pulse_5ms = np.concatenate(
-        (
-            rise_and_fall[:half_length],
-            np.ones((int(sampleRate * 0.004),)),
-            rise_and_fall[half_length:],
-        )
-    )
-    pulse_10ms = np.concatenate(
-        (
-            rise_and_fall[:half_length],
-            np.ones((int(sampleRate * 0.009),)),
-            rise_and_fall[half_length:],
-        )
-    )
-
-    data_2ms_10Hz = np.zeros((sampleRate,), dtype=np.float64)
-
-    for i in range(0, 10):
-        interval = sampleRate / 10
-        data_2ms_10Hz[i * interval : i * interval + pulse_2ms.size] = pulse_2ms
-
-    data_5ms = np.zeros((sampleRate,), dtype=np.float64)
-    data_5ms[: pulse_5ms.size] = pulse_5ms
-
-    data_10ms = np.zeros((sampleRate,), dtype=np.float64)
-    data_10ms[: pulse_10ms.size] = pulse_10ms
-
-    data_10s = np.zeros((sampleRate * 10,), dtype=np.float64)
-    data_10s[:-2] = 1
+    # built once per Stim computer, then loaded from cache:
+    waveforms_by_name = opto_waveforms.get_waveforms(sampleRate)
+    data_cosine = waveforms_by_name["cosine"]  # 1 s cosine ramp
+    data_2ms_10Hz = waveforms_by_name["2ms_10Hz"]
+    data_5ms = waveforms_by_name["5ms"]
+    data_10ms = waveforms_by_name["10ms"]
+    data_10s = waveforms_by_name["10s"]
 
     # %% for experiment
 
@@ -246,9 +213,11 @@ def optotagging(
     print("saved.")
 
     # %%
-    run_optotagging(
-        opto_levels, opto_conditions, waveforms, opto_isis, float(sampleRate)
-    )
+    if playback == "buffered":
+        run = opto_waveforms.run_buffered
+    else:
+        run = run_optotagging
+    run(opto_levels, opto_conditions, waveforms, opto_isis, float(sampleRate))
 
 
 # %%
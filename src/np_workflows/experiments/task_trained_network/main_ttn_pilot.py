@@ -2,9 +2,6 @@ import contextlib
 import copy
 import functools
 import pathlib
-import shutil
-import time
-import zlib
 from typing import Literal
 
 import np_config
@@ -23,6 +20,9 @@ from np_services import (
 from pyparsing import Any
 
 import np_workflows
+from np_workflows.shared import waiters, weblog
+from np_workflows.shared.base_experiments import awaitable
+from np_workflows.shared.checksum import ChecksumManifest, validate_or_overwrite
 
 from .ttn_stim_config import (
     TTNSession,
@@ -38,7 +38,7 @@ from .ttn_stim_config import (
 logger = np_logging.getLogger(__name__)
 
 
-class TTNMixin:
+class TTNMixin(waiters.WithStimLatency):
     """Provides TTN-specific methods and attributes, mainly related to camstim scripts."""
 
     ttn_session: TTNSession
@@ -60,6 +60,16 @@ class TTNMixin:
             label: f"ttn_{label}_script.py" for label in ("main", "mapping", "opto")
         }
 
+    @property
+    def script_modules_on_local(self) -> tuple[pathlib.Path, ...]:
+        "Modules imported by scripts, which must be copied alongside them on Stim."
+        return (
+            pathlib.Path(__file__).parents[2]
+            / "shared"
+            / "camstim_scripts"
+            / "opto_waveforms.py",
+        )
+
     @property
     def stim_root_on_stim(self) -> pathlib.Path:
         "Path to dev folder on Stim computer, as seen from local machine."
@@ -135,26 +145,37 @@ class TTNMixin:
             ScriptCamstim.start()
 
             with contextlib.suppress(Exception):
-                np_logging.web(f"ttn_{self.ttn_session.name.lower()}").info(
+                weblog.web(f"ttn_{self.ttn_session.name.lower()}").info(
                     f"{stim.capitalize()} stim started"
                 )
 
             with contextlib.suppress(Exception):
-                while not ScriptCamstim.is_ready_to_start():
-                    time.sleep(2.5)
+                waiters.wait_for_stims(
+                    (ScriptCamstim,), max_latency_s=self.stim_max_latency_s
+                )
 
             if isinstance(ScriptCamstim, Finalizable):
                 ScriptCamstim.finalize()
 
             with contextlib.suppress(Exception):
-                np_logging.web(f"ttn_{self.ttn_session.name.lower()}").info(
+                weblog.web(f"ttn_{self.ttn_session.name.lower()}").info(
                     f"{stim.capitalize()} stim finished"
                 )
 
+    @functools.cached_property
+    def checksum_manifest(self) -> ChecksumManifest:
+        "Known digests of local and Stim copies of scripts and stim files."
+        return ChecksumManifest.default()
+
+    arun_stim_scripts = awaitable("run_stim_scripts")
+
     def validate_or_copy_stim_files(self):
         for vc_copy in self.stim_root_on_local.iterdir():
             stim_copy = self.stim_root_on_stim / vc_copy.name
-            validate_or_overwrite(validate=stim_copy, src=vc_copy)
+            validate_or_overwrite(
+                validate=stim_copy, src=vc_copy, manifest=self.checksum_manifest
+            )
+        self.checksum_manifest.save()
 
     @property
     def params(
@@ -176,15 +197,19 @@ class TTNMixin:
 
         Verifies Stim copy matches v.c., or overwrites on Stim.
         """
-        for label in ("main", "mapping", "opto"):
-            script = self.script_names[label]
-            vc_copy = self.script_root_on_local / script
+        for vc_copy in (
+            *(self.script_root_on_local / s for s in self.script_names.values()),
+            *self.script_modules_on_local,
+        ):
             stim_copy = np_config.local_to_unc(
                 self.rig.stim,
-                self.script_root_on_stim / script,
+                self.script_root_on_stim / vc_copy.name,
             )
 
-            validate_or_overwrite(validate=stim_copy, src=vc_copy)
+            validate_or_overwrite(
+                validate=stim_copy, src=vc_copy, manifest=self.checksum_manifest
+            )
+        self.checksum_manifest.save()
 
         return {
             label: str(self.script_root_on_stim / script)
@@ -243,26 +268,8 @@ def new_experiment(
     experiment.ttn_session = session
 
     with contextlib.suppress(Exception):
-        np_logging.web(f"ttn_{experiment.ttn_session.name.lower()}").info(
+        weblog.web(f"ttn_{experiment.ttn_session.name.lower()}").info(
             f"{experiment} created"
         )
 
     return experiment
-
-
-# --------------------------------------------------------------------------------------
-
-
-def validate_or_overwrite(validate: str | pathlib.Path, src: str | pathlib.Path):
-    "Checksum validate against `src`, (over)write `validate` as `src` if different."
-    validate, src = pathlib.Path(validate), pathlib.Path(src)
-
-    def copy():
-        logger.debug("Copying %s to %s", src, validate)
-        shutil.copy2(src, validate)
-
-    while validate.exists() == False or (v := zlib.crc32(validate.read_bytes())) != (
-        c := zlib.crc32(pathlib.Path(src).read_bytes())
-    ):
-        copy()
-    logger.debug("Validated %s CRC32: %08X", validate, (v & 0xFFFFFFFF))
@@ -117,7 +117,12 @@ def per_session_main_stim_params(session: TTNSession) -> dict[str, Any]:
 
 default_ttn_params["opto"] = {}
 
-# all parameters depend on session type (pretest, hab, ephys):
+# "loop": write each trial then sleep for its ISI, as in the original script
+# "buffered": play all trials from one buffer on the DAQ's sample clock
+#   (see `opto_waveforms.run_buffered`)
+default_ttn_params["opto"]["playback"] = "loop"
+
+# other parameters depend on session type (pretest, hab, ephys):
 
 
 def per_session_opto_params(
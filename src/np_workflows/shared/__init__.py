@@ -1,3 +1,49 @@
-from np_workflows.shared.base_experiments import *
-from np_workflows.shared.npxc import *
-from np_workflows.shared.widgets import *
+"""Code shared by all workflows.
+
+Submodules are imported on first attribute access (PEP 562), so importing the
+package doesn't pull in np_services, ipywidgets etc. until they're needed. The
+names in `__all__` of `base_experiments`, `npxc` and `widgets` are available
+here, as with the previous star-imports.
+"""
+
+import importlib
+import importlib.util
+import types
+from typing import Any
+
+_STAR_MODULES = ("base_experiments", "npxc", "widgets")
+"Later modules take precedence for names defined in more than one."
+
+
+def _submodule(name: str) -> types.ModuleType:
+    return importlib.import_module(f"{__name__}.{name}")
+
+
+def _is_submodule(name: str) -> bool:
+    "Checked without importing the submodule."
+    return importlib.util.find_spec(f"{__name__}.{name}") is not None
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    if name == "__all__":
+        names = sorted({n for m in _STAR_MODULES for n in _submodule(m).__all__})
+        globals()["__all__"] = names
+        return names
+    if name.startswith("_"):
+        # private, or probed for by IPython etc.: never a star-import name
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _is_submodule(name):
+        return _submodule(name)
+    for module_name in reversed(_STAR_MODULES):
+        module = _submodule(module_name)
+        if name in module.__all__:
+            value = getattr(module, name)
+            if name in vars(module):
+                # otherwise resolved by the module's `__getattr__`, on each access
+                globals()[name] = value
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__getattr__("__all__")))
@@ -1,19 +1,20 @@
+from __future__ import annotations
+
 import abc
+import asyncio
 import configparser
 import contextlib
 import copy
 import enum
 import functools
+import os
 import pathlib
 import re
-import shutil
+import threading
 import time
-from collections.abc import Iterable, Mapping
-from typing import Any, ClassVar, Literal, Optional, Protocol, Type
+from collections.abc import Callable, Coroutine, Iterable, Mapping, Sequence
+from typing import TYPE_CHECKING, Any, ClassVar, Literal, Optional, Protocol, Type
 
-import fabric
-import invoke
-import ipylab
 import np_config
 import np_logging
 import np_services
@@ -33,11 +34,52 @@ from np_services import (
     Verifiable,
 )
 
+import np_workflows.shared.concurrency as concurrency
 import np_workflows.shared.npxc as npxc
+import np_workflows.shared.profiling as profiling
+import np_workflows.shared.task_scripts as task_scripts
+import np_workflows.shared.transfer as transfer
+import np_workflows.shared.waiters as waiters
+import np_workflows.shared.weblog as weblog
+
+if TYPE_CHECKING:
+    import fabric
+
+__all__ = [
+    "DynamicRoutingExperiment",
+    "PipelineEphys",
+    "PipelineExperiment",
+    "PipelineHab",
+    "WithSession",
+    "WithSessionInfo",
+    "awaitable",
+]
 
 logger = np_logging.getLogger(__name__)
 
 
+def awaitable(method_name: str) -> Callable[..., Coroutine[None, None, object]]:
+    """Create an async variant of a blocking method, which runs it in the event
+    loop's default executor.
+
+    The method is looked up on the instance when awaited, so subclass overrides
+    are respected. Services are module-level singletons: avoid awaiting two
+    phases concurrently that use the same service.
+
+    >>> class Experiment(WithSession):
+    ...     arun_stim = awaitable("run_stim")
+    """
+
+    async def method(self: object, *args: object, **kwargs: object) -> object:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(getattr(self, method_name), *args, **kwargs)
+        )
+
+    method.__name__ = f"a{method_name}"
+    method.__doc__ = f"Awaitable `{method_name}`, run in a worker thread."
+    return method
+
+
 class WithSessionInfo(Protocol):
     @property
     def session(self) -> np_session.Session: ...
@@ -49,7 +91,7 @@ class WithSessionInfo(Protocol):
     def rig(self) -> np_config.Rig: ...
 
 
-class WithSession(abc.ABC):
+class WithSession(waiters.WithStimLatency, abc.ABC):
 
     default_session_subclass: ClassVar[Type[np_session.Session]] = (
         np_session.PipelineSession
@@ -59,6 +101,28 @@ class WithSession(abc.ABC):
     services: tuple[Service, ...] = ()
     "All services. Devices, databases, etc."
 
+    concurrent_services: bool = False
+    """Initialize and test independent services in parallel, instead of one at a
+    time."""
+
+    service_dependencies: ClassVar[Mapping[Service, tuple[Service, ...]]] = {}
+    """Services that must finish initializing and testing before another starts,
+    when `concurrent_services` is True: `{service: (dependency, ...)}`."""
+
+    service_timeout_s: float | None = 120
+    "Max time for each service to initialize and test, when `concurrent_services` is True."
+
+    ephys_copy_mode: Literal["robocopy", "resumable"] = "robocopy"
+    """`robocopy` runs on the Acq computer over ssh. `resumable` copies via this
+    computer, journaling progress in the session folder so an interrupted copy
+    resumes where it left off."""
+
+    profile: bool = bool(os.environ.get("NP_WORKFLOWS_PROFILE"))
+    """Record the duration of each lifecycle method and service call, and write
+    them to the session folder as a Chrome trace (see `write_trace`)."""
+
+    profiler: profiling.Profiler | None = None
+
     workflow: enum.Enum = enum.Enum("BaseWithSessionWorkflow", ("BASECLASS")).BASECLASS  # type: ignore
     """Enum for workflow type, e.g. PRETEST, HAB_AUD, HAB_VIS, EPHYS_ etc."""
 
@@ -67,7 +131,7 @@ class WithSession(abc.ABC):
         if not weblog_name:
             weblog_name = self.workflow.name
         with contextlib.suppress(AttributeError):
-            np_logging.web(f"{weblog_name.lower()}_{self.mouse}").info(message)
+            weblog.web(f"{weblog_name.lower()}_{self.mouse}").info(message)
 
     @property
     @abc.abstractmethod
@@ -114,13 +178,40 @@ class WithSession(abc.ABC):
             )
 
         self.session = session
+        self.transfer_report = transfer.TransferReport(str(self.session))
+        "Per-file records from the copy methods, reset by `copy_files`."
 
         self.configure_services()
         self.session.npexp_path.mkdir(parents=True, exist_ok=True)
+        if self.profile:
+            self.enable_profiling()
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.session})"
 
+    def enable_profiling(self) -> profiling.Profiler:
+        """Start recording spans for lifecycle methods and calls to `self.services`.
+
+        Service methods are wrapped in-place until `disable_profiling` is called.
+        """
+        self.profiler = profiling.Profiler(str(self.session))
+        profiling.instrument_services(self.profiler, self.services)
+        return self.profiler
+
+    def disable_profiling(self) -> None:
+        profiling.uninstrument_services(self.services)
+        self.profiler = None
+
+    @property
+    def trace_path(self) -> pathlib.Path:
+        return self.session.npexp_path / f"{self.session.folder}.trace.json"
+
+    def write_trace(self) -> pathlib.Path | None:
+        "Write recorded spans to the session folder, if profiling is enabled."
+        if self.profiler is None:
+            return None
+        return self.profiler.write(self.trace_path)
+
     @classmethod
     def generate_session(cls, *args, **kwargs):
         return cls.default_session_subclass.new(*args, **kwargs)
@@ -168,7 +259,7 @@ class WithSession(abc.ABC):
         with contextlib.suppress(AttributeError):
             return self._rig
         with contextlib.suppress(ValueError):
-            self._rig = np_config.Rig()
+            self._rig = npxc.get_rig()
             return self.rig
 
     @property
@@ -195,7 +286,7 @@ class WithSession(abc.ABC):
         with contextlib.suppress(AttributeError):
             return self._config
         if self.rig:
-            self._config = self.rig.config
+            self._config = npxc.get_config()
         return self.config
 
     def configure_services(self) -> None:
@@ -214,20 +305,57 @@ class WithSession(abc.ABC):
                 apply_config(base)
             apply_config(service)
 
+    @profiling.profiled
     def initialize_and_test_services(self) -> None:
 
+        if self.concurrent_services:
+            self.initialize_and_test_services_concurrently()
+            return
+
         for service in self.services:
+            self.initialize_and_test_service(service)
+
+    @staticmethod
+    def initialize_and_test_service(service: Service) -> None:
+        if isinstance(service, Initializable):
+            service.initialize()
 
-            if isinstance(service, Initializable):
-                service.initialize()
+        if isinstance(service, Testable):
+            service.test()
 
-            if isinstance(service, Testable):
-                service.test()
+    @profiling.profiled
+    def initialize_and_test_services_concurrently(self) -> None:
+        """Initialize then test each service on a thread pool, starting each one as
+        soon as its `service_dependencies` have finished.
 
+        Timings are logged and stored in `self.service_timings`. The first error
+        encountered (in order of `self.services`) is raised after all services have
+        finished or timed out.
+        """
+        self.service_timings = concurrency.run_with_dependencies(
+            tasks={
+                service: functools.partial(self.initialize_and_test_service, service)
+                for service in self.services
+            },
+            dependencies=self.service_dependencies,
+            timeout=self.service_timeout_s,
+            name=lambda service: service.__name__,
+        )
+        logger.info(
+            "%s | Initialized and tested services:\n%s",
+            self.__class__.__name__,
+            concurrency.format_timings(self.service_timings.values()),
+        )
+        for timing in self.service_timings.values():
+            if timing.error is not None:
+                raise timing.error
+
+    @profiling.profiled
     def pretest_services(self) -> None:
         for service in (_ for _ in self.services if isinstance(_, Pretestable)):
             service.pretest()
 
+    @profiling.profiled
     def start_recording(self, *recorders: Startable) -> None:
         if not recorders and hasattr(self, "recorders"):
             recorders = self.recorders
@@ -239,6 +367,7 @@ class WithSession(abc.ABC):
                 if isinstance(recorder, Verifiable):
                     recorder.verify()
 
+    @profiling.profiled
     def stop_recording_after_stim_finished(
         self,
         recorders: Optional[Iterable[Stoppable]] = None,
@@ -253,8 +382,7 @@ class WithSession(abc.ABC):
             recorders = reversed(self.recorders)
         if not stims and hasattr(self, "stims"):
             stims = self.stims
-        while not all(_.is_ready_to_start() for _ in stims):
-            time.sleep(5)
+        waiters.wait_for_stims(stims or (), max_latency_s=self.stim_max_latency_s)
         for stoppable in (_ for _ in recorders if isinstance(_, Stoppable)):
             stoppable.stop()
             if "videomvr" in stoppable.__name__.lower():
@@ -264,6 +392,7 @@ class WithSession(abc.ABC):
                     f"Waiting additional {sleep_s} s for MVR to finish writing..."
                 )
 
+    @profiling.profiled
     def start_services(self, *services: Service) -> None:
         if not services:
             services = self.services
@@ -272,37 +401,88 @@ class WithSession(abc.ABC):
             if isinstance(service, Verifiable):
                 service.verify()
 
+    @profiling.profiled
     def stop_services(self) -> None:
-        while not np_services.ScriptCamstim.is_ready_to_start():
-            time.sleep(10)
+        waiters.wait_for_stims(
+            (np_services.ScriptCamstim,), max_latency_s=self.stim_max_latency_s
+        )
         for service in (_ for _ in self.services if isinstance(_, Stoppable)):
             service.stop()
             if isinstance(service, Finalizable):
                 service.finalize()
 
+    @profiling.profiled
     def validate_services(self, *services: Service) -> None:
         if not services:
             services = self.services
         for service in (_ for _ in services if isinstance(_, Validatable)):
             service.validate()
 
+    @profiling.profiled
     def finalize_services(self, *services: Service) -> None:
         if not services:
             services = self.services
         for service in (_ for _ in services if isinstance(_, Finalizable)):
             service.finalize()
 
+    @profiling.profiled
     def shutdown_services(self) -> None:
         for service in (_ for _ in self.services if isinstance(_, Shutdownable)):
             service.shutdown()
 
+    # awaitable variants of the blocking lifecycle methods, for use in notebook cells
+    # with `await`, or to overlap phases with `asyncio.gather`
+    ainitialize_and_test_services = awaitable("initialize_and_test_services")
+    apretest_services = awaitable("pretest_services")
+    astart_recording = awaitable("start_recording")
+    astop_recording_after_stim_finished = awaitable(
+        "stop_recording_after_stim_finished"
+    )
+    astart_services = awaitable("start_services")
+    astop_services = awaitable("stop_services")
+    avalidate_services = awaitable("validate_services")
+    afinalize_services = awaitable("finalize_services")
+    ashutdown_services = awaitable("shutdown_services")
+    acopy_files = awaitable("copy_files")
+    acopy_data_files = awaitable("copy_data_files")
+    acopy_workflow_files = awaitable("copy_workflow_files")
+    acopy_mpe_configs = awaitable("copy_mpe_configs")
+    acopy_ephys = awaitable("copy_ephys")
+
+    @profiling.profiled
     def copy_files(self) -> None:
-        """Copy files from raw data storage to session folder for all services."""
-        self.copy_data_files()
-        self.copy_workflow_files()
-        self.copy_mpe_configs()
-        if self.session_type != "hab":
-            self.copy_ephys()
+        """Copy files from raw data storage to session folder for all services.
+
+        A report of every file transferred is written to the session folder.
+        """
+        self.transfer_report = transfer.TransferReport(str(self.session))
+        try:
+            self.copy_data_files()
+            self.copy_workflow_files()
+            self.copy_mpe_configs()
+            if self.session_type != "hab":
+                self.copy_ephys()
+        finally:
+            with contextlib.suppress(OSError):
+                self.transfer_report.write(self.transfer_report_path)
+            with contextlib.suppress(OSError):
+                self.write_trace()
+
+    @property
+    def transfer_report_path(self) -> pathlib.Path:
+        return self.session.npexp_path / f"{self.session.folder}.transfer_report.json"
+
+    def transfer_files(
+        self,
+        pairs: Iterable[tuple[pathlib.Path, pathlib.Path]],
+        labels: Sequence[str] | str = "",
+    ) -> list[transfer.TransferResult]:
+        """Copy (src, dest) pairs concurrently and add the results to
+        `self.transfer_report`. Raises the first error after all have finished."""
+        results = transfer.transfer_files(pairs, labels=labels, check=False)
+        self.transfer_report.add(results)
+        transfer.raise_first_error(results)
+        return results
 
     @abc.abstractmethod
     def copy_data_files(self) -> None:
@@ -314,6 +494,83 @@ class WithSession(abc.ABC):
         """Copy ephys data from Acq to session folder."""
         return NotImplemented
 
+    @staticmethod
+    def acq_connection() -> fabric.Connection:
+        "SSH connection to the Acq computer, for running robocopy."
+        import fabric
+
+        password = npxc.fetch_config("/logins")["svc_neuropix"]["password"]
+        return fabric.Connection(
+            host=np_services.OpenEphys.host,
+            user="svc_neuropix",
+            connect_kwargs={"password": password},
+        )
+
+    def ephys_transfer(self, ephys_folder: pathlib.Path) -> transfer.ResumableTreeCopy:
+        "Resumable copy of an ephys folder to the session folder, with its journal."
+        return transfer.ResumableTreeCopy(
+            src=ephys_folder,
+            dest=self.session.npexp_path / ephys_folder.name,
+            journal=self.session.npexp_path / f"{ephys_folder.name}.copy_journal.json",
+        )
+
+    @profiling.profiled
+    def copy_ephys_folder(
+        self, ephys_folder: pathlib.Path, ssh: fabric.Connection | None = None
+    ) -> transfer.TreeProgress | None:
+        """Copy an ephys folder with `self.ephys_copy_mode`, then report what remains.
+
+        Copy errors are logged, not raised: re-run to resume or retry.
+        """
+        ephys_transfer = self.ephys_transfer(ephys_folder)
+        t0 = time.perf_counter()
+        if self.ephys_copy_mode == "resumable":
+            try:
+                return ephys_transfer.run()
+            except OSError as exc:
+                logger.warning("Failed to copy %s: %r", ephys_folder, exc)
+            finally:
+                self.transfer_report.add(ephys_transfer.results, label="ephys")
+        elif ssh is not None:
+            with ssh:
+                # /j unbuffered, /s incl non-empty subdirs, /xo exclude src files
+                # older than dest, /bytes sizes in summary as bytes.
+                # exit codes < 8 are success
+                result = ssh.run(
+                    f'robocopy "{ephys_folder}" "{ephys_transfer.dest}" /j /s /xo /bytes',
+                    warn=True,
+                )
+            # robocopy doesn't report per-file: record the folder as a whole
+            size = transfer.robocopy_bytes_copied(result.stdout)
+            if size is None:
+                logger.warning("No robocopy summary for %s", ephys_folder)
+            self.transfer_report.add(
+                [
+                    transfer.TransferResult(
+                        src=ephys_folder,
+                        dest=ephys_transfer.dest,
+                        size=size or 0,
+                        duration=time.perf_counter() - t0,
+                    )
+                ],
+                label="ephys (robocopy)",
+            )
+        try:
+            progress = ephys_transfer.progress()
+        except OSError as exc:
+            logger.warning("Could not check copy of %s: %r", ephys_folder, exc)
+            return None
+        if not progress.complete:
+            logger.warning(
+                "Incomplete copy of %s: %s. %d files (%.1f GB) remain",
+                ephys_folder,
+                progress,
+                len(progress.remaining),
+                progress.bytes_remaining / 1e9,
+            )
+        return progress
+
+    @profiling.profiled
     def copy_workflow_files(self) -> None:
         """Copy working directory (with ipynb, logs folder) and lock/pyproject files
         from np_notebooks root."""
@@ -324,24 +581,38 @@ class WithSession(abc.ABC):
         dest = self.session.npexp_path / "exp"
         dest.mkdir(exist_ok=True, parents=True)
 
-        shutil.copytree(cwd, dest, dirs_exist_ok=True)
+        pairs: list[tuple[pathlib.Path, pathlib.Path]] = []
+        for path in cwd.rglob("*"):
+            if path.is_file():
+                pairs.append((path, dest / path.relative_to(cwd)))
+            elif path.is_dir():
+                # including empty folders
+                (dest / path.relative_to(cwd)).mkdir(parents=True, exist_ok=True)
 
         lock = cwd.parent / "uv.lock"
         pyproject = cwd.parent / "pyproject.toml"
 
-        for _ in (lock, pyproject):
-            shutil.copy2(_, dest)
+        pairs.extend((_, dest / _.name) for _ in (lock, pyproject))
+        self.transfer_files(pairs, labels="workflow")
 
+    @profiling.profiled
     def copy_mpe_configs(self) -> None:
         """Copy MPE config files to session folder."""
-        for path in (
-            self.rig.mvr_config,
-            self.rig.sync_config,
-            self.rig.camstim_config,
-        ):
-            shutil.copy2(path, self.session.npexp_path)
+        self.transfer_files(
+            (
+                (path, self.session.npexp_path)
+                for path in (
+                    self.rig.mvr_config,
+                    self.rig.sync_config,
+                    self.rig.camstim_config,
+                )
+            ),
+            labels="mpe_configs",
+        )
 
     def save_current_notebook(self) -> None:
+        import ipylab
+
         app = ipylab.JupyterFrontEnd()
         app.commands.execute("docmanager:save")
         # TODO use the following to export to html (shows input to widgets and
@@ -390,11 +661,13 @@ class PipelineExperiment(WithSession):
         self.session.platform_json.update("rig_id", str(self.rig))
         return self.session.platform_json
 
+    @profiling.profiled
     def start_recording(self, *recorders: Startable) -> None:
         super().start_recording(*recorders)
         self.platform_json.ExperimentStartTime = npxc.now()
         self.platform_json.write()
 
+    @profiling.profiled
     def stop_recording_after_stim_finished(
         self,
         recorders: Optional[Iterable[Stoppable]] = None,
@@ -405,6 +678,7 @@ class PipelineExperiment(WithSession):
         self.platform_json.ExperimentCompleteTime = npxc.now()
         self.platform_json.write()
 
+    @profiling.profiled
     def rename_split_ephys_folders(self) -> None:
         "Add `_probeABC` or `_probeDEF` to ephys folders recorded on two drives."
         folders = np_services.OpenEphys.data_files
@@ -442,8 +716,11 @@ class PipelineExperiment(WithSession):
         pattern = rf"{hexchars}{{8}}-{hexchars}{{4}}-{hexchars}{{4}}-{hexchars}{{4}}-{hexchars}{{12}}"
         return re.search(pattern, text) is not None
 
+    @profiling.profiled
     def copy_data_files(self) -> None:
         """Copy data files from raw data storage to session folder for all services."""
+        pairs: list[tuple[pathlib.Path, pathlib.Path]] = []
+        labels: list[str] = []
         for service in self.services:
             match service.__name__:
                 case "np_services.open_ephys":
@@ -456,7 +733,7 @@ class PipelineExperiment(WithSession):
                         continue
                     files = set(files)
                     logger.info("%s | Copying files %r", service.__name__, files)
-                    for file in files:
+                    for file in sorted(files):
                         renamed = None
                         if file.suffix == ".h5":
                             renamed = f"{self.session.folder}.sync"
@@ -502,26 +779,30 @@ class PipelineExperiment(WithSession):
                                     renamed = (
                                         f"{self.session.folder}{img_label}{file.suffix}"
                                     )
-                        shutil.copy2(
-                            file, self.session.npexp_path / (renamed or file.name)
-                        )
-
+                        dest = self.session.npexp_path / (renamed or file.name)
+                        if dest in (d for _, d in pairs):
+                            logger.warning(
+                                "%s | %s would overwrite another file copied to %s:"
+                                " keeping its original name",
+                                service.__name__,
+                                file,
+                                dest.name,
+                            )
+                            dest = self.session.npexp_path / file.name
+                        pairs.append((file, dest))
+                        labels.append(service.__name__)
+        self.transfer_files(pairs, labels)
+
+    @profiling.profiled
     def copy_ephys(self) -> None:
         # copy ephys
         self.rename_split_ephys_folders()
-        password = np_config.fetch("/logins")["svc_neuropix"]["password"]
-        ssh = fabric.Connection(
-            host=np_services.OpenEphys.host,
-            user="svc_neuropix",
-            connect_kwargs=dict(password=password),
-        )
+        ssh = self.acq_connection() if self.ephys_copy_mode == "robocopy" else None
         for ephys_folder in np_services.OpenEphys.data_files:
-            with contextlib.suppress(Exception):
-                with ssh:
-                    ssh.run(
-                        f'robocopy "{ephys_folder}" "{self.session.npexp_path / ephys_folder.name}" /j /s /xo'
-                        # /j unbuffered, /s incl non-empty subdirs, /xo exclude src files older than dest
-                    )
+            try:
+                self.copy_ephys_folder(ephys_folder, ssh)
+            except Exception:
+                logger.exception("Failed to copy %s", ephys_folder)
 
 
 class PipelineEphys(PipelineExperiment):
@@ -558,9 +839,41 @@ class DynamicRoutingExperiment(WithSession):
 
     workflow: Workflow
 
+    def __init__(
+        self,
+        mouse: str | int | np_session.LIMS2MouseInfo | None = None,
+        operator: str | np_session.LIMS2UserInfo | None = None,
+        session: str | pathlib.Path | int | np_session.PipelineSession | None = None,
+        session_type: Literal["ephys", "hab"] | None = None,
+        **kwargs: object,
+    ) -> None:
+        super().__init__(mouse, operator, session, session_type, **kwargs)
+        if self.use_github:
+            self.prefetch_task_scripts()
+
+    def prefetch_task_scripts(self) -> None:
+        """Warm the task script cache in the background, so stims launch without
+        waiting on GitHub.
+
+        Urls are resolved here, so the thread doesn't touch the experiment's lazy
+        attributes.
+        """
+        try:
+            urls = self.task_script_urls()
+            commit_hash = self.commit_hash
+        except Exception:
+            logger.warning("Failed to resolve task scripts to prefetch", exc_info=True)
+            return
+        threading.Thread(
+            target=task_scripts.task_script_cache.warm,
+            args=(urls, commit_hash),
+            name="prefetch_task_scripts",
+            daemon=True,
+        ).start()
+
     @property
     def preset_task_names(self) -> tuple[str, ...]:
-        return tuple(np_config.fetch("/projects/dynamicrouting")["preset_task_names"])
+        return tuple(npxc.fetch_config("/projects/dynamicrouting")["preset_task_names"])
 
     @property
     def commit_hash(self) -> str:
@@ -768,6 +1081,36 @@ class DynamicRoutingExperiment(WithSession):
     def camstim_script(self) -> upath.UPath:
         return self.task_script_base / "runTask.py"
 
+    def gh_task_script_params(self, task_script: str) -> dict[str, str]:
+        "Files fetched from GitHub by runTask.py, sent as `GHTaskScriptParams`."
+        return {
+            "taskScript": task_script,
+            "taskControl": (self.task_script_base / "TaskControl.py").as_posix(),
+            "taskUtils": (self.task_script_base / "TaskUtils.py").as_posix(),
+        }
+
+    def task_script_urls(
+        self, gh_task_script_params: Mapping[str, str] | None = None
+    ) -> tuple[str | upath.UPath, ...]:
+        "runTask.py and the files in `gh_task_script_params` (default: those for the task)."
+        if gh_task_script_params is None:
+            gh_task_script_params = self.gh_task_script_params(
+                (self.task_script_base / self.task_params["taskScript"]).as_posix()
+            )
+        return (self.camstim_script, *gh_task_script_params.values())
+
+    def warm_task_scripts(
+        self, gh_task_script_params: Mapping[str, str] | None = None
+    ) -> dict[str, BaseException]:
+        """Fetch `task_script_urls` into the local cache, in parallel.
+
+        Errors are logged and returned, not raised.
+        """
+        return task_scripts.task_script_cache.warm(
+            self.task_script_urls(gh_task_script_params), self.commit_hash
+        )
+
+    @profiling.profiled
     def run_script(
         self,
         stim: Literal[
@@ -798,14 +1141,14 @@ class DynamicRoutingExperiment(WithSession):
 
         if self.use_github:
 
-            params["GHTaskScriptParams"] = {
-                "taskScript": params["taskScript"],
-                "taskControl": (self.task_script_base / "TaskControl.py").as_posix(),
-                "taskUtils": (self.task_script_base / "TaskUtils.py").as_posix(),
-            }
+            params["GHTaskScriptParams"] = self.gh_task_script_params(
+                params["taskScript"]
+            )
             params["task_script_commit_hash"] = self.commit_hash
 
-            np_services.ScriptCamstim.script = self.camstim_script.read_text()
+            np_services.ScriptCamstim.script = task_scripts.task_script_cache.read_text(
+                self.camstim_script, self.commit_hash
+            )
         else:
             np_services.ScriptCamstim.script = self.camstim_script.as_posix()
 
@@ -826,8 +1169,9 @@ class DynamicRoutingExperiment(WithSession):
 
         np_services.ScriptCamstim.start()
         with contextlib.suppress(np_services.resources.zro.ZroError):
-            while not np_services.ScriptCamstim.is_ready_to_start():
-                time.sleep(1)
+            waiters.wait_for_stims(
+                (np_services.ScriptCamstim,), max_latency_s=self.stim_max_latency_s
+            )
 
         self.log(f"{stim} complete")
 
@@ -844,12 +1188,24 @@ class DynamicRoutingExperiment(WithSession):
     run_spontaneous = functools.partialmethod(run_script, "spontaneous")
     run_spontaneous_rewards = functools.partialmethod(run_script, "spontaneous_rewards")
 
+    arun_script = awaitable("run_script")
+    arun_mapping = functools.partialmethod(arun_script, "mapping")
+    arun_sound_test = functools.partialmethod(arun_script, "sound_test")
+    arun_task = functools.partialmethod(arun_script, "task")
+    arun_opto = functools.partialmethod(arun_script, "opto")
+    arun_optotagging = functools.partialmethod(arun_script, "optotagging")
+    arun_spontaneous = functools.partialmethod(arun_script, "spontaneous")
+    arun_spontaneous_rewards = functools.partialmethod(
+        arun_script, "spontaneous_rewards"
+    )
+
     def update_state(self) -> None:
         "Persist useful but non-essential info."
         self.mouse.state["last_session"] = self.session.id
         self.mouse.state["last_workflow"] = str(self.workflow.name)
         self.mouse.state["last_task"] = str(self.task_name)
 
+    @profiling.profiled
     def initialize_and_test_services(self) -> None:
         """Configure, initialize (ie. reset), then test all services."""
 
@@ -867,32 +1223,28 @@ class DynamicRoutingExperiment(WithSession):
 
         super().initialize_and_test_services()
 
+    @profiling.profiled
     def copy_ephys(self) -> None:
         # copy ephys
-        password = np_config.fetch("/logins")["svc_neuropix"]["password"]
-        ssh = fabric.Connection(
-            host=np_services.OpenEphys.host,
-            user="svc_neuropix",
-            connect_kwargs=dict(password=password),
-        )
+        ssh = self.acq_connection() if self.ephys_copy_mode == "robocopy" else None
         for ephys_folder in np_services.OpenEphys.data_files:
             if "__temp__" in ephys_folder.name:
                 continue
             if isinstance(self.session, np_session.TempletonPilotSession):
                 ephys_folder = next(ephys_folder.glob("Record Node*"))
-            with ssh, contextlib.suppress(invoke.UnexpectedExit):
-                ssh.run(
-                    f'robocopy "{ephys_folder}" "{self.session.npexp_path / ephys_folder.name}" /j /s /xo'
-                    # /j unbuffered, /s incl non-empty subdirs, /xo exclude src files older than dest
-                )
+            self.copy_ephys_folder(ephys_folder, ssh)
 
+    @profiling.profiled
     def copy_data_files(self) -> None:
         """Copy files from raw data storage to session folder for all services
         except Open Ephys."""
 
         # vimba files are copied automatically on creation
 
+        pairs: list[tuple[pathlib.Path, pathlib.Path]] = []
+        labels: list[str] = []
         for service in self.services:
+            files: Iterable[pathlib.Path]
             match service.__name__:
                 case "ScriptCamstim" | "SessionCamstim":
                     files = tuple(
@@ -907,26 +1259,25 @@ class DynamicRoutingExperiment(WithSession):
                         self.rig.paths["NewScaleCoordinateRecorder"].glob("*")
                     )
                 case _:
-                    files: Iterable[pathlib.Path] = (
-                        service.data_files or service.get_latest_data("*")
-                    )
+                    files = service.data_files or service.get_latest_data("*")
             if not files:
                 continue
-            files = set(files)
-            print(files)
-            for file in files:
-                shutil.copy2(file, self.session.npexp_path)
-                npxc.validate_or_overwrite(self.session.npexp_path / file.name, file)
+            unique = set(files)
+            print(unique)
+            pairs.extend((file, self.session.npexp_path) for file in unique)
+            labels.extend(service.__name__ for _ in unique)
+        self.transfer_files(pairs, labels)
 
     # TODO move this to a dedicated np_service class instead of using ScriptCamstim
+    @profiling.profiled
     def run_stim_desktop_theme_script(self, selection: str) -> None:
         np_services.ScriptCamstim.script = (
             "//allen/programs/mindscope/workgroups/dynamicrouting/ben/change_desktop.py"
         )
         np_services.ScriptCamstim.params = {"selection": selection}
         np_services.ScriptCamstim.start()
-        while not np_services.ScriptCamstim.is_ready_to_start():
-            time.sleep(0.1)
+        # a quick script, previously polled every 0.1 s
+        waiters.wait_for_stims((np_services.ScriptCamstim,), max_latency_s=0.1)
 
     set_grey_desktop_on_stim = functools.partialmethod(
         run_stim_desktop_theme_script, "grey"
@@ -0,0 +1,151 @@
+"""Local caches for np_workflows.
+
+On-disk caches live in `~/.np_workflows/cache` by default: override with env var
+`NP_WORKFLOWS_CACHE_DIR`.
+"""
+
+import copy
+import json
+import os
+import pathlib
+import threading
+import time
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any, Generic, TypeVar
+
+import np_logging
+
+logger = np_logging.getLogger(__name__)
+
+CACHE_DIR = pathlib.Path(
+    os.environ.get(
+        "NP_WORKFLOWS_CACHE_DIR", pathlib.Path.home() / ".np_workflows" / "cache"
+    )
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+def cache_dir(*parts: str) -> pathlib.Path:
+    "Subdirectory of `CACHE_DIR`, created if it doesn't exist."
+    path = CACHE_DIR.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def prune(
+    directory: pathlib.Path,
+    max_bytes: int | None = None,
+    max_age_s: float | None = None,
+) -> int:
+    """Delete files in `directory` older than `max_age_s`, then the least recently
+    modified until the rest fit in `max_bytes`. Returns the number deleted."""
+    try:
+        entries = [(p, p.stat()) for p in directory.iterdir() if p.is_file()]
+    except OSError:
+        return 0
+    entries.sort(key=lambda entry: entry[1].st_mtime)
+    now = time.time()
+    total = sum(stat.st_size for _, stat in entries)
+    deleted = 0
+    for path, stat in entries:
+        expired = max_age_s is not None and now - stat.st_mtime > max_age_s
+        if not expired and (max_bytes is None or total <= max_bytes):
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= stat.st_size
+        deleted += 1
+    if deleted:
+        logger.debug("Deleted %d old files from %s", deleted, directory)
+    return deleted
+
+
+class TTLCache(Generic[K, V]):
+    """Thread-safe memo of `loader(key)` that expires entries after `ttl_s` seconds.
+
+    - `get` returns a copy, so callers can't modify the cached value
+    - if `snapshot` is given, values are also written there as JSON and used as a
+      fallback when `loader` fails (e.g. the server is unreachable), which is then
+      cached like a loaded value; keys in `exclude_from_snapshot` are only ever
+      held in memory
+
+    >>> configs = TTLCache(np_config.fetch, ttl_s=600)
+    >>> configs.get("/projects/dynamicrouting")  # fetched
+    >>> configs.get("/projects/dynamicrouting")  # from memory
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[K], V],
+        ttl_s: float = 300,
+        snapshot: str | pathlib.Path | None = None,
+        exclude_from_snapshot: Iterable[K] = (),
+    ) -> None:
+        self.loader = loader
+        self.ttl_s = ttl_s
+        self.snapshot = pathlib.Path(snapshot) if snapshot else None
+        self.exclude_from_snapshot = frozenset(exclude_from_snapshot)
+        self._entries: dict[K, tuple[float, V]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: K, refresh: bool = False) -> V:
+        "Cached value if present and not expired (or `refresh`), otherwise load it."
+        with self._lock:
+            entry = self._entries.get(key)
+        if (
+            entry is not None
+            and not refresh
+            and time.monotonic() - entry[0] < self.ttl_s
+        ):
+            return copy.deepcopy(entry[1])
+        try:
+            value = self.loader(key)
+        except Exception:
+            value = self.read_snapshot().get(key, _MISSING)
+            if value is _MISSING:
+                raise
+            logger.warning("Failed to load %r: using value from %s", key, self.snapshot)
+            # held for `ttl_s` too, rather than retrying the loader on every call
+            with self._lock:
+                self._entries[key] = (time.monotonic(), value)
+            return copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+        self.write_snapshot(key, value)
+        return copy.deepcopy(value)
+
+    def invalidate(self, key: K | None = None) -> None:
+        "Drop `key` from memory, or all keys if None. The snapshot is unchanged."
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def read_snapshot(self) -> dict[Any, Any]:
+        if self.snapshot is None:
+            return {}
+        try:
+            return json.loads(self.snapshot.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def write_snapshot(self, key: K, value: V) -> None:
+        if self.snapshot is None or key in self.exclude_from_snapshot:
+            return
+        try:
+            with self._lock:
+                snapshot = self.read_snapshot()
+                snapshot[key] = value
+                self.snapshot.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.snapshot.with_suffix(".tmp")
+                tmp.write_text(json.dumps(snapshot, indent=1, default=str))
+                tmp.replace(self.snapshot)
+        except (OSError, TypeError, ValueError):
+            logger.debug("Failed to write %r to %s", key, self.snapshot, exc_info=True)
@@ -0,0 +1,394 @@
+"""
+opto_waveforms.py
+
+optotagging waveforms, for opto scripts whose workflow copies this module alongside
+them on Stim (see `TTNMixin.script_modules_on_local`)
+
+waveforms are built with vectorized numpy and cached to an .npz file keyed by
+sample rate and waveform parameters, so they're only built on the first run on
+each Stim computer
+
+`run_buffered` plays a whole trial sequence from a single pre-rendered buffer,
+under the DAQ's sample clock, instead of a write + `time.sleep` per trial
+
+must remain python 2.7-compatible: it's imported by camstim scripts
+
+"""
+
+from __future__ import division, print_function
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+VERSION = 1
+"increment when the construction of any waveform changes, to invalidate caches"
+
+DEFAULT_PARAMS = {
+    "ramp_ms": 1,  # raised-cosine rise + fall of each pulse
+    "pulse_ms": [2, 5, 10],
+    "train_pulse_ms": 2,
+    "train_hz": 10,
+    "cosine_s": 1,
+    "step_s": 10,
+}
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "opto_waveforms")
+
+# digital output port 2 lines, as written by `run_optotagging` in the opto scripts
+SWEEP_ON = np.array([0, 0, 1, 0, 0, 0, 0, 0], dtype=np.uint8)
+STIM_ON = np.array([0, 0, 1, 1, 0, 0, 0, 0], dtype=np.uint8)
+STIM_OFF = np.array([0, 0, 1, 0, 0, 0, 0, 0], dtype=np.uint8)
+SWEEP_OFF = np.array([0, 0, 0, 0, 0, 0, 0, 0], dtype=np.uint8)
+
+LEAD_IN_S = 5
+"sweep on, before the first trial"
+
+STIM_PULSE_S = 0.001
+"width of the `STIM_ON` pulse marking each onset in buffered playback"
+
+START_TIMEOUT_S = 10
+"allowed for buffered playback to start, on top of its duration"
+
+
+def raised_cosine(num_samples, period_samples):
+    """one period of a raised cosine (0 -> 1 -> 0), sampled `num_samples` times"""
+    x = np.arange(num_samples, dtype=np.float64) * 2 * np.pi / period_samples
+    # (+ 1 - 1) as in the original script, so values are bitwise identical
+    return (((1 - np.cos(x)) + 1) - 1) / 2
+
+
+def pulse(width_ms, sampleRate, ramp_ms):
+    """flat-topped pulse of `width_ms`, including a raised-cosine rise and fall
+    lasting `ramp_ms` in total"""
+    ramp_samples = int(sampleRate * ramp_ms / 1000.0)
+    rise_and_fall = raised_cosine(ramp_samples, ramp_samples)
+    half_length = rise_and_fall.size // 2
+    return np.concatenate(
+        (
+            rise_and_fall[:half_length],
+            np.ones((int(sampleRate * (width_ms - ramp_ms) / 1000.0),)),
+            rise_and_fall[half_length:],
+        )
+    )
+
+
+def pulse_train(data, num_samples, num_pulses, interval_samples):
+    """`num_pulses` copies of `data`, every `interval_samples`, zero-padded to
+    `num_samples`"""
+    train = np.zeros((num_samples,), dtype=np.float64)
+    starts = np.arange(num_pulses) * interval_samples
+    idx = starts[:, np.newaxis] + np.arange(data.size)
+    train[idx.ravel()] = np.tile(data, num_pulses)
+    return train
+
+
+def build_waveforms(sampleRate=10000, params=None):
+    """dict of waveform name -> array
+
+    - '2ms_10Hz': 1 s train of 2 ms pulses at 10 Hz
+    - '5ms', '10ms' (and any other `pulse_ms`): single pulse at the start of 1 s
+    - 'cosine': 1 s raised cosine
+    - '10s': 10 s step, returning to 0 for the last 2 samples
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    sampleRate = int(sampleRate)
+    ramp = params["ramp_ms"]
+
+    waveforms = {}
+    train_pulse = pulse(params["train_pulse_ms"], sampleRate, ramp)
+    waveforms["%dms_%dHz" % (params["train_pulse_ms"], params["train_hz"])] = (
+        pulse_train(
+            train_pulse,
+            sampleRate,
+            params["train_hz"],
+            sampleRate // params["train_hz"],
+        )
+    )
+    for width_ms in params["pulse_ms"]:
+        if width_ms == params["train_pulse_ms"]:
+            continue
+        waveforms["%dms" % width_ms] = pulse_train(
+            pulse(width_ms, sampleRate, ramp), sampleRate, 1, 0
+        )
+    waveforms["cosine"] = raised_cosine(
+        sampleRate * params["cosine_s"], sampleRate * params["cosine_s"]
+    )
+    step = np.zeros((sampleRate * params["step_s"],), dtype=np.float64)
+    step[:-2] = 1
+    waveforms["%ds" % params["step_s"]] = step
+    return waveforms
+
+
+def cache_path(sampleRate, params=None, cache_dir=None):
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    key = json.dumps([VERSION, int(sampleRate), params], sort_keys=True)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir or CACHE_DIR, "waveforms_%s.npz" % digest)
+
+
+def get_waveforms(sampleRate=10000, params=None, cache_dir=None):
+    """`build_waveforms`, loaded from the cache if previously built"""
+    path = cache_path(sampleRate, params, cache_dir)
+    try:
+        npz = np.load(path)
+        try:
+            return dict((name, npz[name]) for name in npz.files)
+        finally:
+            npz.close()
+    except Exception:  # missing or unreadable: rebuild
+        pass
+    waveforms = build_waveforms(sampleRate, params)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            np.savez(f, **waveforms)
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        pass  # cache is optional
+    return waveforms
+
+
+# buffered playback ------------------------------------------------------------------ #
+
+
+def render_sequence(
+    levels, conditions, waveforms, isis, sampleRate=10000.0, lead_in_s=LEAD_IN_S
+):
+    """analog and digital output for a whole trial sequence, sample by sample
+
+    timing follows `run_optotagging`, where the analog write returns as soon as the
+    waveform is buffered and the ISI is slept while it plays:
+
+    - trial i plays `waveforms[conditions[i]] * levels[i]` from its onset, and the
+      next trial's onset is `isis[i]` seconds later
+    - unlike the loop, a waveform is never cut short or overlapped by the next
+      trial: if it outlasts its ISI, the next onset waits until it ends
+    - digital output is `SWEEP_ON` from the first sample to the last, with a
+      `STIM_ON` pulse of `STIM_PULSE_S` at each onset, in place of the loop's
+      `STIM_ON` / `STIM_OFF` writes either side of the analog write
+    - the last sample is 0 V, `SWEEP_OFF`
+
+    returns (analog output, digital output with one row of lines per sample,
+    sample index of each trial's onset)
+    """
+    levels = np.asarray(levels, dtype=np.float64)
+    conditions = np.asarray(conditions, dtype=int)
+    sizes = np.array([waveforms[c].size for c in conditions], dtype=int)
+    gaps = np.round(np.asarray(isis, dtype=np.float64) * sampleRate).astype(int)
+    lead_in = int(round(lead_in_s * sampleRate))
+    pulse_samples = max(int(np.round(STIM_PULSE_S * sampleRate)), 1)
+
+    ends = lead_in + np.cumsum(np.maximum(sizes, gaps))
+    onsets = np.concatenate(([lead_in], ends[:-1])).astype(int)[: ends.size]
+    num_samples = (ends[-1] if ends.size else lead_in) + 1
+
+    ao = np.zeros((num_samples,), dtype=np.float64)
+    do = np.empty((num_samples, SWEEP_ON.size), dtype=np.uint8)
+    do[:] = SWEEP_ON
+    do[-1] = SWEEP_OFF
+    for condition in np.unique(conditions):
+        waveform = np.asarray(waveforms[condition], dtype=np.float64)
+        trials = conditions == condition
+        idx = onsets[trials][:, np.newaxis] + np.arange(waveform.size)
+        ao[idx] = levels[trials][:, np.newaxis] * waveform
+        pulses = onsets[trials][:, np.newaxis] + np.arange(
+            min(pulse_samples, waveform.size)
+        )
+        do[pulses.ravel()] = STIM_ON
+    return ao, do, onsets
+
+
+def run_buffered(
+    levels,
+    conditions,
+    waveforms,
+    isis,
+    sampleRate=10000.0,
+    AnalogOutput=None,
+    DigitalOutput=None,
+    device="Dev1",
+):
+    """play a trial sequence from one buffer, clocked by the DAQ
+
+    an alternative to `run_optotagging` in the opto scripts, with the same
+    arguments: interval timing doesn't depend on `time.sleep` or on Python keeping
+    up. `AnalogOutput` and `DigitalOutput` default to those in `toolbox.IO.nidaq`:
+    pass `FakeAnalogOutput` and `FakeDigitalOutput` to run without a DAQ.
+    """
+    if AnalogOutput is None or DigitalOutput is None:
+        from toolbox.IO.nidaq import AnalogOutput, DigitalOutput
+
+    ao_data, do_data, _ = render_sequence(
+        levels, conditions, waveforms, isis, sampleRate
+    )
+
+    ao = AnalogOutput(device, channels=[1])
+    ao.cfg_sample_clock(sampleRate, mode="finite", buffer_size=ao_data.size)
+    do = DigitalOutput(device, 2)
+    # digital output shares the analog output's clock, so edges line up to the sample
+    do.cfg_sample_clock(
+        sampleRate,
+        source="/%s/ao/SampleClock" % device,
+        mode="finite",
+        buffer_size=len(do_data),
+    )
+
+    do.write(do_data)
+    ao.write(ao_data)
+    do.start()  # waits for the analog output's clock
+    ao.start()
+    # tasks are finite: wait for the last sample (SWEEP_OFF) to be generated, however
+    # long the start took, before clearing them
+    timeout = ao_data.size / sampleRate + START_TIMEOUT_S
+    wait_until_done(ao, timeout)
+    wait_until_done(do, timeout)
+
+    do.clear()
+    ao.clear()
+
+
+def wait_until_done(task, timeout):
+    """block until a finite output task has generated all its samples
+
+    uses the task's own wait if it has one (`wait_until_done`, or PyDAQmx's
+    `WaitUntilTaskDone`), otherwise sleeps for `timeout`
+    """
+    for name in ("wait_until_done", "WaitUntilTaskDone"):
+        wait = getattr(task, name, None)
+        if wait is not None:
+            wait(timeout)
+            return
+    time.sleep(timeout)
+
+
+class FakeTask(object):
+    """stand-in for a `toolbox.IO.nidaq` output task: records what's configured,
+    written and called, in order across all fake tasks
+
+    a finite task is done once `wait_until_done` is called after `start`, so no
+    time passes
+    """
+
+    calls = []  # type: list
+    "(task, method name) for each call to any fake task"
+
+    def __init__(self, device, *args, **kwargs):
+        self.device = device
+        self.sample_rate = None
+        self.clock_source = None
+        self.mode = None
+        self.buffer_size = None
+        self.written = []
+        "(seconds since `start`, data) for each write"
+        self.started = None
+        self.done = False
+        self.cleared = False
+
+    def _record(self, name):
+        FakeTask.calls.append((self, name))
+
+    def cfg_sample_clock(self, rate, source=None, mode=None, buffer_size=None):
+        self._record("cfg_sample_clock")
+        self.sample_rate = rate
+        self.clock_source = source
+        self.mode = mode
+        self.buffer_size = buffer_size
+
+    def start(self):
+        self._record("start")
+        self.started = time.time()
+
+    def write(self, data):
+        self._record("write")
+        t = None if self.started is None else time.time() - self.started
+        self.written.append((t, np.array(data, copy=True)))
+
+    def wait_until_done(self, timeout):
+        self._record("wait_until_done")
+        if self.started is None:
+            raise RuntimeError("task was not started")
+        self.done = self.mode == "finite"
+
+    def stop(self):
+        self._record("stop")
+
+    def clear(self):
+        self._record("clear")
+        self.cleared = True
+
+
+class FakeAnalogOutput(FakeTask):
+    pass
+
+
+class FakeDigitalOutput(FakeTask):
+    pass
+
+
+def onset_times(do_data, sampleRate):
+    """times of `STIM_ON` rising edges in a rendered digital output buffer"""
+    stim_line = np.concatenate(([0], np.asarray(do_data)[:, 3])).astype(np.int8)
+    return np.flatnonzero(np.diff(stim_line) == 1) / sampleRate
+
+
+if __name__ == "__main__":
+    # compares onset-to-onset intervals with the ISIs asked for. This is not a
+    # like-for-like benchmark, as there's no DAQ here:
+    # - loop: measured, with per-trial writes + time.sleep as in `run_optotagging`
+    #   (minus the 5 s lead-in). Writes go to fake tasks, so this is only the jitter
+    #   of `time.sleep` and interpreter scheduling: real DAQ writes add their own
+    #   latency on top
+    # - buffered: not measured. Onsets are placed on the DAQ's sample clock, so
+    #   their only error is each ISI rounded to a whole sample, which is computed
+    #   here from the rendered buffer
+    import sys
+
+    num_trials = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    sampleRate = 10000.0
+    waveforms = [np.ones((20,))]
+    conditions = [0] * num_trials
+    levels = [1.0] * num_trials
+    isis = np.random.random(num_trials) * 0.05 + 0.05
+
+    do = FakeDigitalOutput("Dev1", 2)
+    ao = FakeAnalogOutput("Dev1", channels=[1])
+    do.start()
+    ao.start()
+    t0 = time.time()
+    onsets = []
+    for i, level in enumerate(levels):
+        data = waveforms[conditions[i]]
+        onsets.append(time.time() - t0)
+        do.write(STIM_ON)
+        ao.write(data * level)
+        do.write(STIM_OFF)
+        time.sleep(isis[i])
+    loop_error = np.diff(onsets) - isis[:-1]
+
+    _, do_data, _ = render_sequence(
+        levels, conditions, waveforms, isis, sampleRate, lead_in_s=0
+    )
+    rounding_error = np.diff(onset_times(do_data, sampleRate)) - isis[:-1]
+
+    for label, error in (
+        ("loop: measured sleep jitter", loop_error),
+        ("buffered: ISI rounding, not measured", rounding_error),
+    ):
+        print(
+            "%-38s onset interval error: mean %7.3f ms, sd %7.3f ms, max %7.3f ms"
+            % (
+                label,
+                1e3 * error.mean(),
+                1e3 * error.std(),
+                1e3 * np.abs(error).max(),
+            )
+        )
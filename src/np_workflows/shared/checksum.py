@@ -0,0 +1,256 @@
+"""Chunked file checksums and copy-validation with a bounded retry policy.
+
+Files are hashed in fixed-size chunks, so peak memory doesn't depend on file size.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from typing import Any, Literal, Protocol
+
+import np_logging
+
+import np_workflows.shared.cache as cache
+
+logger = np_logging.getLogger(__name__)
+
+Algorithm = Literal["crc32", "xxhash", "sha256"]
+DEFAULT_ALGORITHM: Algorithm = "crc32"
+DEFAULT_CHUNK_SIZE = 8 * 1024**2
+
+
+class Hasher(Protocol):
+    def update(self, data: bytes, /) -> None: ...
+    def hexdigest(self) -> str: ...
+
+
+class CRC32:
+    "`hashlib`-like wrapper around `zlib.crc32`."
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def update(self, data: bytes, /) -> None:
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value & 0xFFFFFFFF:08X}"
+
+
+def new_hasher(algorithm: Algorithm = DEFAULT_ALGORITHM) -> Hasher:
+    match algorithm:
+        case "crc32":
+            return CRC32()
+        case "sha256":
+            return hashlib.sha256()
+        case "xxhash":
+            try:
+                import xxhash
+            except ImportError as exc:
+                raise ImportError(
+                    "`pip install xxhash` to use algorithm='xxhash'"
+                ) from exc
+            return xxhash.xxh3_64()
+        case _:
+            raise ValueError(f"Unknown checksum algorithm: {algorithm!r}")
+
+
+def file_checksum(
+    path: str | pathlib.Path,
+    algorithm: Algorithm = DEFAULT_ALGORITHM,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> str:
+    "Hex digest of a file's contents, read in chunks of `chunk_size` bytes."
+    hasher = new_hasher(algorithm)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ChecksumManifest:
+    """Persistent record of known digests, keyed by path, size and mtime.
+
+    A file whose size and mtime haven't changed since it was last hashed isn't
+    read again: only a `stat` is needed to look up its digest.
+
+    >>> manifest = ChecksumManifest.default()
+    >>> manifest.checksum(path)  # reads `path` the first time only
+    >>> manifest.save()
+    """
+
+    def __init__(self, path: str | pathlib.Path) -> None:
+        self.path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] | None = None
+        self._modified = False
+
+    @classmethod
+    def default(cls) -> "ChecksumManifest":
+        return cls(cache.cache_dir() / "checksum_manifest.json")
+
+    @property
+    def entries(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    @staticmethod
+    def key(path: pathlib.Path) -> str:
+        return path.as_posix()
+
+    def get(
+        self,
+        path: str | pathlib.Path,
+        algorithm: Algorithm = DEFAULT_ALGORITHM,
+        stat: os.stat_result | None = None,
+    ) -> str | None:
+        "Recorded digest, if the file's size and mtime match the record."
+        path = pathlib.Path(path)
+        stat = stat or path.stat()
+        with self._lock:
+            entry = self.entries.get(self.key(path))
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime_ns"] != stat.st_mtime_ns
+        ):
+            return None
+        return entry.get(algorithm)
+
+    def put(
+        self,
+        path: str | pathlib.Path,
+        digest: str,
+        algorithm: Algorithm = DEFAULT_ALGORITHM,
+        stat: os.stat_result | None = None,
+    ) -> None:
+        path = pathlib.Path(path)
+        stat = stat or path.stat()
+        with self._lock:
+            entry = self.entries.get(self.key(path))
+            if (
+                entry is None
+                or entry["size"] != stat.st_size
+                or entry["mtime_ns"] != stat.st_mtime_ns
+            ):
+                entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                self.entries[self.key(path)] = entry
+            entry[algorithm] = digest
+            self._modified = True
+
+    def checksum(
+        self, path: str | pathlib.Path, algorithm: Algorithm = DEFAULT_ALGORITHM
+    ) -> str:
+        "Digest from the manifest if the file is unchanged, otherwise hash and record it."
+        path = pathlib.Path(path)
+        stat = path.stat()
+        if (digest := self.get(path, algorithm, stat)) is not None:
+            logger.debug("Manifest hit for %s %s: %s", path, algorithm, digest)
+            return digest
+        digest = file_checksum(path, algorithm)
+        self.put(path, digest, algorithm, stat)
+        return digest
+
+    def save(self) -> None:
+        "Write to disk, if any entries were added or changed."
+        with self._lock:
+            if not self._modified:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.entries, indent=1))
+            tmp.replace(self.path)
+            self._modified = False
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    """Number of attempts and exponential backoff between them."""
+
+    max_attempts: int = 3
+    backoff_s: float = 1.0
+    backoff_factor: float = 2.0
+    max_backoff_s: float = 30.0
+
+    def delays(self) -> Iterator[float]:
+        "Seconds to wait before each re-attempt."
+        delay = self.backoff_s
+        for _ in range(self.max_attempts - 1):
+            yield min(delay, self.max_backoff_s)
+            delay *= self.backoff_factor
+
+
+DEFAULT_RETRY = RetryPolicy()
+
+
+@dataclasses.dataclass
+class ValidationResult:
+    """Outcome of `validate_or_overwrite`."""
+
+    path: pathlib.Path
+    src: pathlib.Path
+    algorithm: Algorithm
+    digest: str | None = None
+    "Checksum of `path` after the final attempt."
+    src_digest: str | None = None
+    attempts: int = 0
+    "Number of times `path` was checked."
+    copies: int = 0
+    "Number of times `src` was (re-)copied to `path`."
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.digest is not None and self.digest == self.src_digest
+
+
+def validate_or_overwrite(
+    validate: str | pathlib.Path,
+    src: str | pathlib.Path,
+    algorithm: Algorithm = DEFAULT_ALGORITHM,
+    retry: RetryPolicy = DEFAULT_RETRY,
+    check: bool = True,
+    manifest: ChecksumManifest | None = None,
+) -> ValidationResult:
+    """Checksum validate against `src`, (over)write `validate` as `src` if different.
+
+    - gives up after `retry.max_attempts` copies
+    - if `check`, raises `OSError` when the files still differ
+    - if a `manifest` is supplied, unchanged files are looked up instead of read
+    """
+    validate, src = pathlib.Path(validate), pathlib.Path(src)
+    result = ValidationResult(path=validate, src=src, algorithm=algorithm)
+    t0 = time.perf_counter()
+    get_checksum = manifest.checksum if manifest else file_checksum
+    result.src_digest = get_checksum(src, algorithm)
+    delays = retry.delays()
+    while True:
+        result.attempts += 1
+        result.digest = get_checksum(validate, algorithm) if validate.exists() else None
+        if result.ok or result.copies >= retry.max_attempts:
+            break
+        if result.copies and (delay := next(delays, None)) is not None:
+            time.sleep(delay)
+        logger.debug("Copying %s to %s", src, validate)
+        shutil.copy2(src, validate)
+        result.copies += 1
+    result.duration = time.perf_counter() - t0
+    if result.ok:
+        logger.debug("Validated %s %s: %s", validate, algorithm, result.digest)
+    elif check:
+        raise OSError(
+            f"Checksum mismatch after {result.copies} copies:"
+            f" {validate} ({result.digest}) != {src} ({result.src_digest})"
+        )
+    return result
@@ -0,0 +1,150 @@
+"""Run independent tasks on a thread pool, respecting declared dependencies."""
+
+import concurrent.futures
+import dataclasses
+import time
+from collections.abc import Callable, Hashable, Iterable, Mapping
+from typing import Any, TypeVar
+
+import np_logging
+
+logger = np_logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+
+
+@dataclasses.dataclass
+class TaskTiming:
+    """Wall-clock record of a single task."""
+
+    name: str
+    start: float | None = None
+    end: float | None = None
+    error: BaseException | None = None
+
+    @property
+    def duration(self) -> float | None:
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    @property
+    def ok(self) -> bool:
+        return self.end is not None and self.error is None
+
+
+def _time_left(starts: Iterable[float | None], timeout: float | None) -> float | None:
+    "Seconds until the earliest of `starts` is `timeout` seconds ago."
+    if timeout is None:
+        return None
+    now = time.perf_counter()
+    return max(0, min(((start or now) + timeout - now for start in starts), default=0))
+
+
+def _skipped(dependencies: Iterable[TaskTiming]) -> RuntimeError | None:
+    "Error recorded for a task if any of its dependencies failed."
+    if failed := [d.name for d in dependencies if d.error is not None]:
+        return RuntimeError("Skipped: dependencies failed: " + ", ".join(failed))
+    return None
+
+
+def _pop_overdue(
+    running: dict[concurrent.futures.Future, K],
+    timings: Mapping[K, TaskTiming],
+    timeout: float | None,
+) -> list[K]:
+    "Remove tasks running for longer than `timeout` from `running`, and return them."
+    if timeout is None:
+        return []
+    now = time.perf_counter()
+    overdue = [
+        future
+        for future, key in running.items()
+        if (start := timings[key].start) is not None and now - start > timeout
+    ]
+    return [running.pop(future) for future in overdue]
+
+
+def run_with_dependencies(
+    tasks: Mapping[K, Callable[[], Any]],
+    dependencies: Mapping[K, Iterable[K]] | None = None,
+    max_workers: int = 8,
+    timeout: float | None = None,
+    name: Callable[[K], str] = str,
+) -> dict[K, TaskTiming]:
+    """Run each task once all of its dependencies have completed successfully.
+
+    - tasks without dependencies (or whose dependencies aren't in `tasks`) start
+      immediately
+    - a task that runs longer than `timeout` seconds is recorded with a
+      `TimeoutError` (its thread can't be interrupted, so it's left to finish in the
+      background)
+    - tasks whose dependencies failed are skipped and recorded with a `RuntimeError`
+    - returns timings in the same order as `tasks`: errors are recorded, not raised
+    """
+    dependencies = dependencies or {}
+    pending = {
+        key: {dep for dep in dependencies.get(key, ()) if dep in tasks and dep != key}
+        for key in tasks
+    }
+    timings = {key: TaskTiming(name=name(key)) for key in tasks}
+    running: dict[concurrent.futures.Future, K] = {}
+    completed: set[K] = set()
+
+    def run(key: K) -> None:
+        timings[key].start = time.perf_counter()
+        try:
+            tasks[key]()
+        finally:
+            timings[key].end = time.perf_counter()
+
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="tasks"
+    )
+    try:
+        while pending or running:
+            # skipping a task can make its dependents ready (to be skipped in turn),
+            # so repeat until nothing more is ready
+            while ready := [k for k, deps in pending.items() if deps <= completed]:
+                for key in ready:
+                    deps = pending.pop(key)
+                    if error := _skipped([timings[d] for d in deps]):
+                        timings[key].error = error
+                        completed.add(key)
+                    else:
+                        running[executor.submit(run, key)] = key
+            if not running:
+                if pending:
+                    raise ValueError(f"Circular dependencies: {list(pending)}")
+                break
+            done, _ = concurrent.futures.wait(
+                running,
+                timeout=_time_left(
+                    (timings[k].start for k in running.values()), timeout
+                ),
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                key = running.pop(future)
+                timings[key].error = future.exception()
+                completed.add(key)
+            for key in _pop_overdue(running, timings, timeout):
+                timings[key].error = TimeoutError(
+                    f"{name(key)} did not finish within {timeout} s"
+                )
+                completed.add(key)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return timings
+
+
+def format_timings(timings: Iterable[TaskTiming]) -> str:
+    "Table of task durations and outcomes, for logging."
+    lines = []
+    for timing in timings:
+        duration = (
+            f"{timing.duration:7.2f} s" if timing.duration is not None else "      - s"
+        )
+        status = "ok" if timing.ok else f"{timing.error!r}"
+        lines.append(f"{timing.name:<40} {duration}  {status}")
+    return "\n".join(lines)
@@ -0,0 +1,142 @@
+"""Wait for a file to be created or modified in a directory.
+
+Uses native file-change notifications via `watchdog`, if it's installed. Otherwise
+(or as a fallback, for network shares that don't deliver notifications) the
+directory is listed with `os.scandir` and compared against a high-water mark of
+the latest modification time seen, so each poll is a single directory listing
+with no per-file `stat` calls on Windows.
+"""
+
+import contextlib
+import os
+import pathlib
+import queue
+import time
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+import np_logging
+
+if TYPE_CHECKING:
+    import watchdog.events
+
+logger = np_logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL_S = 0.25
+DEFAULT_FALLBACK_INTERVAL_S = 2.0
+"Interval between directory listings when native notifications are in use."
+
+
+class ScandirWatcher:
+    """Reports files whose mtime is newer than any seen so far."""
+
+    def __init__(self, directory: str | pathlib.Path) -> None:
+        self.directory = pathlib.Path(directory)
+        self.high_water_ns = max((mtime_ns for _, mtime_ns in self.scan()), default=0)
+
+    def scan(self) -> list[tuple[str, int]]:
+        with os.scandir(self.directory) as entries:
+            return [
+                (entry.path, entry.stat().st_mtime_ns)
+                for entry in entries
+                if entry.is_file()
+            ]
+
+    def changed(self) -> pathlib.Path | None:
+        "Most-recently modified file newer than the high-water mark, if any."
+        newer = [(m, p) for p, m in self.scan() if m > self.high_water_ns]
+        if not newer:
+            return None
+        mtime_ns, path = max(newer)
+        self.high_water_ns = mtime_ns
+        return pathlib.Path(path)
+
+
+@contextlib.contextmanager
+def _native_events(
+    directory: pathlib.Path,
+) -> Iterator[queue.Queue[pathlib.Path] | None]:
+    "Queue of paths created or modified in `directory`, or None if unavailable."
+    try:
+        import watchdog.events
+        import watchdog.observers
+    except ImportError:
+        yield None
+        return
+
+    events: queue.Queue[pathlib.Path] = queue.Queue()
+
+    class Handler(watchdog.events.FileSystemEventHandler):
+        def on_any_event(self, event: "watchdog.events.FileSystemEvent") -> None:
+            if event.is_directory or event.event_type not in (
+                "created",
+                "modified",
+                "moved",
+            ):
+                return
+            events.put(pathlib.Path(getattr(event, "dest_path", "") or event.src_path))
+
+    observer = watchdog.observers.Observer()
+    try:
+        observer.schedule(Handler(), str(directory), recursive=False)
+        observer.start()
+    except Exception:
+        logger.debug(
+            "Native notifications unavailable for %s", directory, exc_info=True
+        )
+        yield None
+        return
+    try:
+        yield events
+    finally:
+        observer.stop()
+        observer.join(timeout=1)
+
+
+def wait_until_stable(
+    path: pathlib.Path, interval_s: float = 0.2, timeout_s: float = 10
+) -> None:
+    "Wait for `path` to stop changing size, so a file still being written isn't read."
+    t0 = time.monotonic()
+    last = None
+    while time.monotonic() - t0 < timeout_s:
+        with contextlib.suppress(OSError):
+            if (size := path.stat().st_size) == last:
+                return
+            last = size
+        time.sleep(interval_s)
+
+
+def wait_for_new_file(
+    directory: str | pathlib.Path,
+    timeout_s: float = 300,
+    poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+) -> pathlib.Path:
+    """Block until a file in `directory` is created or modified, then return it.
+
+    - existing, unmodified files are ignored
+    - raises `TimeoutError` after `timeout_s`
+    """
+    directory = pathlib.Path(directory)
+    scanner = ScandirWatcher(directory)
+    t0 = time.monotonic()
+    with _native_events(directory) as events:
+        interval = poll_interval_s if events is None else DEFAULT_FALLBACK_INTERVAL_S
+        last_scan = time.monotonic()
+        while True:
+            path = None
+            if events is not None:
+                with contextlib.suppress(queue.Empty):
+                    path = events.get(timeout=poll_interval_s)
+            else:
+                time.sleep(poll_interval_s)
+            if path is None and time.monotonic() - last_scan >= interval:
+                path = scanner.changed()
+                last_scan = time.monotonic()
+            if path is not None and path.is_file():
+                wait_until_stable(path)
+                return path
+            if time.monotonic() - t0 > timeout_s:
+                raise TimeoutError(
+                    f"No new file detected in {directory} after {timeout_s} seconds"
+                )
@@ -0,0 +1,179 @@
+"""Display-sized thumbnails of images on disk, for notebook widgets.
+
+Full-resolution images can be several MB: sending them to the frontend makes the
+notebook sluggish and bloats the saved .ipynb. Thumbnails are decoded and encoded
+on a worker thread and cached in memory by (path, mtime, options), so re-running a
+cell doesn't re-read the file. With `persist=True` they're also cached on local
+disk, so they survive a kernel restart. The original file is untouched.
+"""
+
+import collections
+import concurrent.futures
+import dataclasses
+import hashlib
+import io
+import json
+import os
+import pathlib
+import threading
+from collections.abc import Callable, Hashable
+from typing import TYPE_CHECKING, Literal
+
+import np_logging
+
+import np_workflows.shared.cache as cache
+
+if TYPE_CHECKING:
+    import PIL.Image
+
+logger = np_logging.getLogger(__name__)
+
+Format = Literal["png", "jpeg", "webp"]
+
+DEFAULT_MAX_SIZE: tuple[int, int] = (1280, 1280)
+DEFAULT_FORMAT: Format = "png"
+DEFAULT_QUALITY = 85
+"For lossy formats."
+MAX_CACHED = 32
+MAX_PERSISTED_BYTES = 200 * 1024**2
+MAX_PERSISTED_AGE_S = 30 * 24 * 60 * 60
+"Persisted thumbnails older than this, or beyond the size limit, are deleted."
+
+_cache: collections.OrderedDict[Hashable, "Thumbnail"] = collections.OrderedDict()
+_lock = threading.Lock()
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="images"
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class Thumbnail:
+    path: pathlib.Path
+    data: bytes
+    format: Format
+    size: tuple[int, int]
+    "Width, height of the thumbnail."
+    original_size: tuple[int, int]
+
+
+def disk_path(key: Hashable, format: Format) -> pathlib.Path:
+    "Location of a persisted thumbnail: its metadata is alongside, as .json."
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+    return cache.cache_dir("thumbnails") / f"{digest}.{format}"
+
+
+def read_persisted(key: Hashable, format: Format) -> "Thumbnail | None":
+    path = disk_path(key, format)
+    try:
+        meta = json.loads(path.with_suffix(".json").read_text())
+        data = path.read_bytes()
+    except (OSError, ValueError):
+        return None
+    return Thumbnail(
+        path=pathlib.Path(meta["path"]),
+        data=data,
+        format=format,
+        size=tuple(meta["size"]),
+        original_size=tuple(meta["original_size"]),
+    )
+
+
+def write_persisted(key: Hashable, thumbnail: "Thumbnail") -> None:
+    path = disk_path(key, thumbnail.format)
+    try:
+        path.write_bytes(thumbnail.data)
+        path.with_suffix(".json").write_text(
+            json.dumps(
+                {
+                    "path": str(thumbnail.path),
+                    "size": thumbnail.size,
+                    "original_size": thumbnail.original_size,
+                }
+            )
+        )
+    except OSError:
+        logger.debug("Failed to persist thumbnail of %s", thumbnail.path, exc_info=True)
+    cache.prune(path.parent, MAX_PERSISTED_BYTES, MAX_PERSISTED_AGE_S)
+
+
+def remember(key: Hashable, thumbnail: "Thumbnail") -> None:
+    "Add to the in-memory cache, dropping the least recently used beyond `MAX_CACHED`."
+    with _lock:
+        _cache[key] = thumbnail
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+
+def encode(
+    image: "PIL.Image.Image",
+    max_size: tuple[int, int] = DEFAULT_MAX_SIZE,
+    format: Format = DEFAULT_FORMAT,
+    quality: int = DEFAULT_QUALITY,
+) -> tuple[bytes, tuple[int, int]]:
+    "Downscale a copy of `image` to fit within `max_size`, and encode it."
+    image = image.copy()
+    image.thumbnail(max_size)
+    if format == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, quality=quality, optimize=True)
+    return buffer.getvalue(), image.size
+
+
+def thumbnail(
+    path: str | pathlib.Path,
+    max_size: tuple[int, int] = DEFAULT_MAX_SIZE,
+    format: Format = DEFAULT_FORMAT,
+    draw: Callable[["PIL.Image.Image"], None] | None = None,
+    draw_key: Hashable = None,
+    persist: bool = False,
+) -> Thumbnail:
+    """Downscaled, encoded copy of the image at `path`, cached by (path, mtime).
+
+    `draw` is applied to the full-resolution image before downscaling (e.g. to add
+    annotations in image coordinates): `draw_key` must identify what it draws, as
+    it's part of the cache key.
+
+    If `persist`, the result is also cached on local disk.
+    """
+    import PIL.Image
+
+    path = pathlib.Path(path)
+    key = (path.as_posix(), os.stat(path).st_mtime_ns, max_size, format, draw_key)
+    with _lock:
+        if (cached := _cache.get(key)) is not None:
+            _cache.move_to_end(key)
+            return cached
+    if persist and (persisted := read_persisted(key, format)) is not None:
+        remember(key, persisted)
+        return persisted
+    with PIL.Image.open(path) as image:
+        image.load()
+        original_size = image.size
+        if draw is not None:
+            image = image.convert("RGB") if image.mode == "P" else image
+            draw(image)
+        data, size = encode(image, max_size, format)
+    result = Thumbnail(
+        path=path, data=data, format=format, size=size, original_size=original_size
+    )
+    logger.debug(
+        "Thumbnail of %s: %s -> %s, %d bytes", path, original_size, size, len(data)
+    )
+    if persist:
+        write_persisted(key, result)
+    remember(key, result)
+    return result
+
+
+def thumbnail_async(
+    path: str | pathlib.Path,
+    max_size: tuple[int, int] = DEFAULT_MAX_SIZE,
+    format: Format = DEFAULT_FORMAT,
+    draw: Callable[["PIL.Image.Image"], None] | None = None,
+    draw_key: Hashable = None,
+    persist: bool = False,
+) -> concurrent.futures.Future[Thumbnail]:
+    "`thumbnail` on a worker thread, so the kernel isn't blocked while decoding."
+    return _executor.submit(thumbnail, path, max_size, format, draw, draw_key, persist)
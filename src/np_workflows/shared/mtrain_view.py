@@ -0,0 +1,133 @@
+"""Cached, indexed views of MTrain regimens and each mouse's current stage.
+
+Every `np_session.MTrain.stage` access costs three requests, and
+`MTrain.get_all("regimens")` pages through every regimen. Here, regimens are
+fetched once per process and indexed by name and id, and each mouse's state is
+fetched once and reused until `refresh` or `set_regimen_and_stage` is called.
+"""
+
+import dataclasses
+import threading
+from typing import Any
+
+import np_logging
+import np_session
+
+logger = np_logging.getLogger(__name__)
+
+Regimen = dict[str, Any]
+"MTrain regimen: keys include 'id', 'name', 'stages', 'states'."
+Stage = dict[str, Any]
+
+_lock = threading.Lock()
+_regimens: "RegimenIndex | None" = None
+_views: dict[str, "MTrainView"] = {}
+
+
+@dataclasses.dataclass(frozen=True)
+class RegimenIndex:
+    regimens: tuple[Regimen, ...]
+    by_name: dict[str, Regimen]
+    by_id: dict[int, Regimen]
+
+    @classmethod
+    def from_regimens(cls, regimens: list[Regimen]) -> "RegimenIndex":
+        return cls(
+            regimens=tuple(regimens),
+            by_name={regimen["name"]: regimen for regimen in regimens},
+            by_id={int(regimen["id"]): regimen for regimen in regimens},
+        )
+
+    @property
+    def names(self) -> list[str]:
+        return sorted(self.by_name)
+
+
+def get_regimens(refresh: bool = False) -> RegimenIndex:
+    "All MTrain regimens, fetched on first use and shared by every view."
+    global _regimens
+    with _lock:
+        if _regimens is None or refresh:
+            _regimens = RegimenIndex.from_regimens(
+                np_session.MTrain.get_all("regimens")
+            )
+            logger.debug("Fetched %d MTrain regimens", len(_regimens.regimens))
+        return _regimens
+
+
+class MTrainView:
+    """A mouse's MTrain regimen and stage, fetched once and reused.
+
+    >>> view = get_view(366122)
+    >>> view.stage["name"]  # one request
+    >>> view.stage["name"]  # cached
+    """
+
+    def __init__(self, client: np_session.MTrain) -> None:
+        self.client = client
+        self._state: dict[str, int] | None = None
+
+    @property
+    def mouse_id(self) -> str:
+        return str(self.client.mouse_id)
+
+    @property
+    def state(self) -> dict[str, int]:
+        "Keys 'id', 'regimen_id', 'stage_id'."
+        if self._state is None:
+            self._state = self.client.state
+        return self._state
+
+    @property
+    def regimen(self) -> Regimen:
+        regimen_id = int(self.state["regimen_id"])
+        if (regimen := get_regimens().by_id.get(regimen_id)) is None:
+            # regimen created since the index was fetched
+            regimen = get_regimens(refresh=True).by_id[regimen_id]
+        return regimen
+
+    @property
+    def stages(self) -> list[Stage]:
+        return self.regimen["stages"]
+
+    @property
+    def stage(self) -> Stage | None:
+        stage_id = self.state["stage_id"]
+        return next((s for s in self.stages if s["id"] == stage_id), None)
+
+    @property
+    def stage_name(self) -> str | None:
+        "None if the mouse's stage isn't in its regimen."
+        return None if (stage := self.stage) is None else stage["name"]
+
+    def refresh(self) -> None:
+        "Re-fetch the mouse's state on next access."
+        self._state = None
+
+    def set_regimen_and_stage(
+        self, regimen: Regimen | int | str, stage: Stage | int | str
+    ) -> None:
+        self.client.set_regimen_and_stage(regimen=regimen, stage=stage)
+        self.refresh()
+
+
+def get_view(
+    mouse: str | int | np_session.Mouse | np_session.MTrain,
+) -> MTrainView:
+    "Shared view for a mouse, so widgets and validators use the same cached state."
+    if isinstance(mouse, np_session.MTrain):
+        mouse_id = str(mouse.mouse_id)
+    elif isinstance(mouse, np_session.Mouse):
+        mouse_id = str(mouse.id)
+    else:
+        mouse_id = str(mouse)
+    with _lock:
+        if (view := _views.get(mouse_id)) is None:
+            if isinstance(mouse, np_session.MTrain):
+                client = mouse
+            elif isinstance(mouse, np_session.Mouse):
+                client = mouse.mtrain
+            else:
+                client = np_session.MTrain(mouse_id)
+            view = _views[mouse_id] = MTrainView(client)
+        return view
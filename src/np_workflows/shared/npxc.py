@@ -1,13 +1,12 @@
 import contextlib
 import datetime
+import functools
 import pathlib
-import shutil
 import sys
 import time
-import zlib
-from collections.abc import Generator, Sequence
+from collections.abc import Callable, Generator, Sequence
+from typing import Any
 
-import fabric
 import np_config
 import np_logging
 import np_services
@@ -18,6 +17,34 @@ from np_services import (
     Service,
 )
 
+import np_workflows.shared.cache as cache
+import np_workflows.shared.checksum as checksum
+import np_workflows.shared.transfer as transfer
+
+__all__ = [
+    "CONFIG_TTL_S",
+    "DEFAULT_LIMS_USER_IDS",
+    "DEFAULT_MOUSE_ID",
+    "config_cache",
+    "copy_files",
+    "fetch_config",
+    "get_config",
+    "get_default_mouse_id",
+    "get_lims_user_ids",
+    "get_operators",
+    "get_rig",
+    "hide_warning_lines",
+    "is_mouse_in_lims",
+    "mouse",
+    "now",
+    "operator",
+    "photodoc",
+    "print_countdown_timer",
+    "session",
+    "toggle_tracebacks",
+    "validate_or_overwrite",
+]
+
 logger = np_logging.getLogger(__name__)
 
 # Assign default values to global variables so they can be imported elsewhere
@@ -32,34 +59,86 @@ session: np_session.Session | str | int = ""
 #     classes.NpUltra,
 #     ) # TODO plug-in experiments
 
-RIG = np_config.Rig()
-CONFIG = RIG.config
-
-lims_user_ids: tuple[str, ...] = tuple(
-    sorted(
-        CONFIG.get(
-            "lims_user_ids",
-            [
-                "hannah.belski",
-                "hannah.cabasco",
-                "ryan.gillis",
-                "henry.loeffler",
-                "corbettb",
-                "ben.hardcastle",
-                "samg",
-                "ethan.mcbride",
-                "jackie.kuyat",
-                "andrew.shelton",
-            ],
-        )
-    )
+DEFAULT_LIMS_USER_IDS = (
+    "hannah.belski",
+    "hannah.cabasco",
+    "ryan.gillis",
+    "henry.loeffler",
+    "corbettb",
+    "ben.hardcastle",
+    "samg",
+    "ethan.mcbride",
+    "jackie.kuyat",
+    "andrew.shelton",
+)
+DEFAULT_MOUSE_ID = 366122
+
+
+CONFIG_TTL_S = 600
+"Seconds before a config fetched with `fetch_config` is fetched again."
+
+config_cache: cache.TTLCache[str, dict[str, Any]] = cache.TTLCache(
+    np_config.fetch,
+    ttl_s=CONFIG_TTL_S,
+    snapshot=cache.CACHE_DIR / "config_snapshot.json",
+    exclude_from_snapshot=("/logins",),
 )
+"""Process-wide cache of ZooKeeper configs. The on-disk snapshot is used if
+ZooKeeper is unreachable; `/logins` is never written to disk."""
+
+
+def fetch_config(key: str, refresh: bool = False) -> dict[str, Any]:
+    "`np_config.fetch(key)`, cached for `CONFIG_TTL_S` seconds."
+    return config_cache.get(key, refresh=refresh)
+
+
+@functools.cache
+def get_rig() -> np_config.Rig:
+    """The rig we're currently on, resolved on first use and shared for the rest of
+    the session.
+
+    Raises `ValueError` if not on a rig (not cached, so it's retried next call).
+    """
+    return np_config.Rig()
+
+
+@functools.cache
+def get_config() -> dict[Any, Any]:
+    "Config for the current rig, fetched once and shared."
+    return get_rig().config
+
+
+def get_lims_user_ids() -> tuple[str, ...]:
+    return tuple(sorted(get_config().get("lims_user_ids", DEFAULT_LIMS_USER_IDS)))
 
-default_mouse_id: int = int(CONFIG.get("default_mouse_id", 366122))
+
+def get_default_mouse_id() -> int:
+    return int(get_config().get("default_mouse_id", DEFAULT_MOUSE_ID))
+
+
+_LAZY_ATTRS: dict[str, Callable[[], Any]] = {
+    "RIG": get_rig,
+    "CONFIG": get_config,
+    "lims_user_ids": get_lims_user_ids,
+    "default_mouse_id": get_default_mouse_id,
+}
+"Module attributes kept for compatibility, resolved on access instead of at import."
+
+__all__ += list(_LAZY_ATTRS)
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    if name in _LAZY_ATTRS:
+        return _LAZY_ATTRS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
 
 
 def get_operators() -> list[str]:
-    return list(lims_user_ids)
+    return list(get_lims_user_ids())
 
 
 def print_countdown_timer(seconds: int | float | datetime.timedelta = 0, **kwargs):
@@ -82,7 +161,7 @@ def photodoc(img_name: str) -> pathlib.Path:
 
     If multiple images are captured, only the last will remain in the Imager.data_files list.
     """
-    if RIG.idx == 0:
+    if get_rig().idx == 0:
         from np_services import Cam3d as ImageCamera
     else:
         from np_services import ImageMVR as ImageCamera
@@ -122,6 +201,7 @@ def photodoc(img_name: str) -> pathlib.Path:
 def copy_files(services: Sequence[Service], session_folder: pathlib.Path):
     """Copy files from raw data storage to session folder for all services."""
     password = input("Enter password for svc_neuropix:")
+    pairs: list[tuple[pathlib.Path, pathlib.Path]] = []
     for service in services:
         match service.__class__.__name__:
             case "OpenEphys" | "open_ephys":
@@ -133,10 +213,12 @@ def copy_files(services: Sequence[Service], session_folder: pathlib.Path):
                         continue
                     files = set(files)
                     print(files)
-                    for file in files:
-                        shutil.copy2(file, session_folder)
+                    pairs.extend((file, session_folder) for file in files)
+    transfer.transfer_files(pairs)
 
-    password = np_config.fetch("/logins")["svc_neuropix"]["password"]
+    import fabric
+
+    password = fetch_config("/logins")["svc_neuropix"]["password"]
     ssh = fabric.Connection(
         host=np_services.OpenEphys.host,
         user="svc_neuropix",
@@ -161,10 +243,10 @@ def hide_warning_lines(msg: str, category: str, *args, **kwargs):
 
 warnings.showwarning = hide_warning_lines
 
-import IPython
-
 
 def toggle_tracebacks() -> Generator[None, None, None]:
+    import IPython
+
     if ipython := IPython.get_ipython():
         show_traceback = ipython.showtraceback
 
@@ -199,21 +281,22 @@ with contextlib.suppress(RuntimeError):
     def hide_tracebacks():
         toggle_tb.send(True)
 
+    __all__ += ["hide_tracebacks", "show_tracebacks"]
+
 
 def now() -> str:
     return np_services.utils.normalize_time(time.time())
 
 
-def validate_or_overwrite(validate: str | pathlib.Path, src: str | pathlib.Path):
+def validate_or_overwrite(
+    validate: str | pathlib.Path,
+    src: str | pathlib.Path,
+    algorithm: checksum.Algorithm = checksum.DEFAULT_ALGORITHM,
+    retry: checksum.RetryPolicy = checksum.DEFAULT_RETRY,
+    check: bool = True,
+    manifest: checksum.ChecksumManifest | None = None,
+) -> checksum.ValidationResult:
     "Checksum validate against `src`, (over)write `validate` as `src` if different."
-    validate, src = pathlib.Path(validate), pathlib.Path(src)
-
-    def copy():
-        logger.debug("Copying %s to %s", src, validate)
-        shutil.copy2(src, validate)
-
-    while validate.exists() == False or (v := zlib.crc32(validate.read_bytes())) != (
-        c := zlib.crc32(pathlib.Path(src).read_bytes())
-    ):
-        copy()
-    logger.debug("Validated %s CRC32: %08X", validate, (v & 0xFFFFFFFF))
+    return checksum.validate_or_overwrite(
+        validate, src, algorithm, retry, check=check, manifest=manifest
+    )
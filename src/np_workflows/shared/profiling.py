@@ -0,0 +1,209 @@
+"""Opt-in timing of workflow phases and service calls, exported as a Chrome trace.
+
+Open the exported JSON in `chrome://tracing` or https://ui.perfetto.dev.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import pathlib
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable
+from typing import Any, TypeVar
+
+import np_logging
+
+logger = np_logging.getLogger(__name__)
+
+SERVICE_METHODS = (
+    "initialize",
+    "test",
+    "start",
+    "verify",
+    "stop",
+    "finalize",
+    "validate",
+)
+"Methods wrapped by `instrument_services`."
+
+_MISSING = object()
+
+_originals: dict[tuple[int, str], object] = {}
+"""`(id(service), method name)` -> what the service's own namespace held before
+`instrument_services`, or `_MISSING`."""
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Profiler:
+    """Records nested, high-resolution spans from any thread.
+
+    >>> profiler = Profiler()
+    >>> with profiler.span("copy_files"):
+    ...     pass
+    >>> profiler.write("trace.json")
+    """
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.events: list[dict[str, Any]] = []
+        self.threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @contextlib.contextmanager
+    def span(
+        self, name: str, category: str = "workflow", **args: object
+    ) -> Generator[None, None, None]:
+        "Record the wall-clock duration of the enclosed block."
+        thread = threading.current_thread()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        except BaseException as exc:
+            args["error"] = repr(exc)
+            raise
+        finally:
+            end = time.perf_counter_ns()
+            with self._lock:
+                self.threads.setdefault(thread.ident or 0, thread.name)
+                self.events.append(
+                    {
+                        "name": name,
+                        "cat": category,
+                        "ph": "X",
+                        "ts": start / 1e3,
+                        "dur": (end - start) / 1e3,
+                        "pid": self._pid,
+                        "tid": thread.ident or 0,
+                        "args": {k: str(v) for k, v in args.items()},
+                    }
+                )
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        "Trace Event Format: complete events, plus process/thread name metadata."
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": 0,
+                "args": {"name": self.name or "np_workflows"},
+            },
+            *(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in threads.items()
+            ),
+        ]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str | pathlib.Path) -> pathlib.Path:
+        path = pathlib.Path(path)
+        path.write_text(json.dumps(self.to_chrome_trace()))
+        logger.info("Wrote %d trace events to %s", len(self.events), path)
+        return path
+
+
+def profiled(method: F) -> F:
+    """Decorate an experiment method to record a span when the instance has a
+    `profiler` (otherwise it's a plain call)."""
+
+    @functools.wraps(method)
+    def wrapper(self: object, *args: object, **kwargs: object) -> object:
+        profiler: Profiler | None = getattr(self, "profiler", None)
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        with profiler.span(method.__qualname__, "lifecycle"):
+            return method(self, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _own(service: object, name: str) -> object:
+    "`name` in `service`'s own namespace (not inherited), or `_MISSING`."
+    return (
+        vars(service).get(name, _MISSING) if hasattr(service, "__dict__") else _MISSING
+    )
+
+
+def _original(service: object, name: str) -> object:
+    """`name` as it was before `instrument_services`. For classes, the descriptor
+    (e.g. classmethod), so it binds to whichever subclass it's called on."""
+    if not isinstance(service, type):
+        original = _originals.get((id(service), name), _own(service, name))
+        return getattr(service, name, None) if original is _MISSING else original
+    for cls in service.__mro__:
+        if (
+            original := _originals.get((id(cls), name), _own(cls, name))
+        ) is not _MISSING:
+            return original
+    return None
+
+
+def _spanned(
+    profiler: Profiler, span_name: str, func: Callable[..., object]
+) -> Callable[..., object]:
+    @functools.wraps(func)
+    def wrapper(*args: object, **kwargs: object) -> object:
+        with profiler.span(span_name, "np_services"):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _instrumented(profiler: Profiler, method: object, span_name: str) -> object:
+    "`method` (a function, classmethod or staticmethod) recording a span per call."
+    if isinstance(method, classmethod):
+        return classmethod(_spanned(profiler, span_name, method.__func__))
+    if isinstance(method, staticmethod):
+        return staticmethod(_spanned(profiler, span_name, method.__func__))
+    assert callable(method)
+    return _spanned(profiler, span_name, method)
+
+
+def instrument_services(profiler: Profiler, services: Iterable[Any]) -> None:
+    """Wrap each service's lifecycle methods to record spans with `profiler`.
+
+    Services are module-level singletons, so this affects every user of them
+    until `uninstrument_services` is called. Re-instrumenting replaces the
+    previous profiler.
+    """
+    for service in services:
+        for method_name in SERVICE_METHODS:
+            method = _original(service, method_name)
+            if not (callable(method) or isinstance(method, classmethod)):
+                continue
+            key = (id(service), method_name)
+            previous = _originals.get(key, _own(service, method_name))
+            span_name = f"{getattr(service, '__name__', service)}.{method_name}"
+            with contextlib.suppress(AttributeError, TypeError):
+                setattr(
+                    service, method_name, _instrumented(profiler, method, span_name)
+                )
+                _originals[key] = previous
+
+
+def uninstrument_services(services: Iterable[Any]) -> None:
+    """Restore methods wrapped by `instrument_services`: methods that were
+    inherited are removed again, rather than overridden."""
+    for service in services:
+        for method_name in SERVICE_METHODS:
+            original = _originals.pop((id(service), method_name), None)
+            if original is None:
+                continue
+            with contextlib.suppress(AttributeError, TypeError):
+                if original is _MISSING:
+                    delattr(service, method_name)
+                else:
+                    setattr(service, method_name, original)
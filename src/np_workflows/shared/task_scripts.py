@@ -0,0 +1,96 @@
+"""Local cache of task scripts hosted on GitHub.
+
+Files are keyed by (url, commit_hash). Content at a commit never changes, so a
+file pinned to a full 40-character commit hash is stored on disk and never
+fetched again; files on a branch, tag or abbreviated hash (which can't be told
+apart from a hex-only branch name) are only held in memory for the session.
+"""
+
+import concurrent.futures
+import hashlib
+import pathlib
+import re
+import threading
+from collections.abc import Iterable
+
+import np_logging
+import upath
+
+import np_workflows.shared.cache as cache
+
+logger = np_logging.getLogger(__name__)
+
+COMMIT_HASH_PATTERN = re.compile(r"[0-9a-fA-F]{40}")
+
+
+def is_pinned(commit_hash: str) -> bool:
+    "Whether `commit_hash` refers to a fixed commit, rather than a branch or tag."
+    return COMMIT_HASH_PATTERN.fullmatch(commit_hash) is not None
+
+
+class TaskScriptCache:
+    """Text of GitHub-hosted files, cached in memory and (for pinned commits) on
+    disk.
+
+    >>> scripts = TaskScriptCache()
+    >>> scripts.read_text(f"{base_url}/runTask.py", commit_hash)  # fetched
+    >>> scripts.read_text(f"{base_url}/runTask.py", commit_hash)  # cached
+    """
+
+    def __init__(self, root: str | pathlib.Path | None = None) -> None:
+        self.root = pathlib.Path(root) if root else cache.CACHE_DIR / "task_scripts"
+        self._memory: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def path(self, url: str, commit_hash: str) -> pathlib.Path:
+        "Location on disk: `<root>/<commit_hash>/<url digest>_<filename>`."
+        digest = hashlib.sha256(url.encode()).hexdigest()[:16]
+        return self.root / commit_hash / f"{digest}_{url.rsplit('/', 1)[-1]}"
+
+    def read_text(self, url: str | upath.UPath, commit_hash: str) -> str:
+        key = (str(url), commit_hash)
+        with self._lock:
+            if (text := self._memory.get(key)) is not None:
+                return text
+        path = self.path(*key)
+        if is_pinned(commit_hash) and path.exists():
+            text = path.read_text(encoding="utf-8")
+            logger.debug("Read %s from cache: %s", key[0], path)
+        else:
+            text = (
+                url if isinstance(url, upath.UPath) else upath.UPath(url)
+            ).read_text()
+            logger.debug("Fetched %s", key[0])
+            if is_pinned(commit_hash):
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_text(text, encoding="utf-8")
+                tmp.replace(path)
+        with self._lock:
+            self._memory[key] = text
+        return text
+
+    def warm(
+        self,
+        urls: Iterable[str | upath.UPath],
+        commit_hash: str,
+        max_workers: int = 4,
+    ) -> dict[str, BaseException]:
+        "Fetch `urls` in parallel. Returns errors by url, rather than raising."
+        errors: dict[str, BaseException] = {}
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="task_scripts"
+        ) as executor:
+            futures = {
+                executor.submit(self.read_text, url, commit_hash): str(url)
+                for url in {str(url): url for url in urls}.values()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                if (exc := future.exception()) is not None:
+                    logger.warning("Failed to fetch %s: %r", futures[future], exc)
+                    errors[futures[future]] = exc
+        return errors
+
+
+task_script_cache = TaskScriptCache()
+"Shared by all experiments in the process."
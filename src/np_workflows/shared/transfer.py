@@ -0,0 +1,469 @@
+"""Concurrent file transfer engine used by `copy_data_files` implementations.
+
+Files are streamed from source to destination in chunks, with the checksum of the
+source computed on the way through, so the source is only read once. The
+destination is then read back and its checksum compared.
+
+`ResumableTreeCopy` copies large directory trees (ephys) with a progress journal.
+"""
+
+import concurrent.futures
+import dataclasses
+import json
+import os
+import pathlib
+import re
+import shutil
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+import np_logging
+
+import np_workflows.shared.checksum as checksum
+
+logger = np_logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = checksum.DEFAULT_CHUNK_SIZE
+DEFAULT_MAX_WORKERS = 4
+
+
+@dataclasses.dataclass
+class TransferResult:
+    """Outcome of copying a single file."""
+
+    src: pathlib.Path
+    dest: pathlib.Path
+    size: int = 0
+    algorithm: checksum.Algorithm = checksum.DEFAULT_ALGORITHM
+    checksum: str | None = None
+    "Digest of the bytes read from `src`."
+    duration: float = 0.0
+    retries: int = 0
+    error: BaseException | None = None
+    label: str = ""
+    "Grouping for reports, e.g. the name of the service that produced the file."
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def throughput(self) -> float:
+        "Bytes per second."
+        return self.size / self.duration if self.duration else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "label": self.label,
+            "src": self.src.as_posix(),
+            "dest": self.dest.as_posix(),
+            "size": self.size,
+            "duration": round(self.duration, 3),
+            "throughput": round(self.throughput),
+            "retries": self.retries,
+            "algorithm": self.algorithm,
+            "checksum": self.checksum,
+            "error": repr(self.error) if self.error is not None else None,
+        }
+
+
+def resolve_dest(src: pathlib.Path, dest: pathlib.Path) -> pathlib.Path:
+    "As with `shutil.copy2`, a directory `dest` means `dest / src.name`."
+    return dest / src.name if dest.is_dir() else dest
+
+
+def stream_copy(
+    src: str | pathlib.Path,
+    dest: str | pathlib.Path,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    algorithm: checksum.Algorithm = checksum.DEFAULT_ALGORITHM,
+) -> tuple[int, str]:
+    """Copy `src` to `dest` in chunks, preserving metadata like `shutil.copy2`.
+
+    Returns (bytes copied, digest of source bytes).
+    """
+    hasher = checksum.new_hasher(algorithm)
+    size = 0
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        while chunk := s.read(chunk_size):
+            hasher.update(chunk)
+            size += len(chunk)
+            d.write(chunk)
+    shutil.copystat(src, dest)
+    return size, hasher.hexdigest()
+
+
+def copy_file(
+    src: str | pathlib.Path,
+    dest: str | pathlib.Path,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    retries: int = 2,
+    algorithm: checksum.Algorithm = checksum.DEFAULT_ALGORITHM,
+) -> TransferResult:
+    """Copy a single file, re-trying if the checksum of the copy doesn't match the
+    source's.
+
+    Exceptions are captured on the returned result rather than raised.
+    """
+    src = pathlib.Path(src)
+    result = TransferResult(
+        src=src, dest=resolve_dest(src, pathlib.Path(dest)), algorithm=algorithm
+    )
+    t0 = time.perf_counter()
+    for attempt in range(retries + 1):
+        result.retries = attempt
+        try:
+            result.dest.parent.mkdir(parents=True, exist_ok=True)
+            result.size, result.checksum = stream_copy(
+                src, result.dest, chunk_size, algorithm
+            )
+            digest = checksum.file_checksum(result.dest, algorithm, chunk_size)
+            if digest != result.checksum:
+                raise OSError(
+                    f"Checksum mismatch after copy: {src} ({result.checksum})"
+                    f" -> {result.dest} ({digest})"
+                )
+        except OSError as exc:
+            result.error = exc
+            logger.debug("Copy attempt %d failed: %r", attempt + 1, exc)
+        else:
+            result.error = None
+            break
+    result.duration = time.perf_counter() - t0
+    return result
+
+
+def transfer_files(
+    pairs: Iterable[tuple[str | pathlib.Path, str | pathlib.Path]],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    retries: int = 2,
+    algorithm: checksum.Algorithm = checksum.DEFAULT_ALGORITHM,
+    check: bool = True,
+    labels: Sequence[str] | str = "",
+) -> list[TransferResult]:
+    """Copy each (src, dest) pair on a bounded thread pool.
+
+    - results are returned in the same order as `pairs`
+    - `labels` are applied to results: one for all, or one per pair
+    - raises `ValueError` if two sources would be copied to the same destination
+    - if `check`, the first error is raised after all transfers have finished
+    """
+    paths = [
+        (pathlib.Path(s), resolve_dest(pathlib.Path(s), pathlib.Path(d)))
+        for s, d in pairs
+    ]
+    if not paths:
+        return []
+    if isinstance(labels, str):
+        labels = [labels] * len(paths)
+    if len(labels) != len(paths):
+        raise ValueError(f"Got {len(labels)} labels for {len(paths)} files")
+    sources: dict[pathlib.Path, pathlib.Path] = {}
+    for src, dest in paths:
+        if sources.setdefault(dest, src) != src:
+            raise ValueError(
+                f"Both {sources[dest]} and {src} would be copied to {dest}"
+            )
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(max_workers, len(paths)),
+        thread_name_prefix="transfer",
+    ) as executor:
+        futures = [
+            executor.submit(
+                copy_file,
+                src,
+                dest,
+                chunk_size=chunk_size,
+                retries=retries,
+                algorithm=algorithm,
+            )
+            for src, dest in paths
+        ]
+    results = [future.result() for future in futures]
+    for result, label in zip(results, labels, strict=True):
+        result.label = label
+        if result.ok:
+            logger.debug(
+                "Copied %s -> %s (%d B, %s %s, %.1f MB/s)",
+                result.src,
+                result.dest,
+                result.size,
+                result.algorithm,
+                result.checksum,
+                result.throughput / 1e6,
+            )
+        else:
+            logger.error(
+                "Failed to copy %s -> %s: %r", result.src, result.dest, result.error
+            )
+    if check:
+        raise_first_error(results)
+    return results
+
+
+def raise_first_error(results: Iterable[TransferResult]) -> None:
+    for result in results:
+        if result.error is not None:
+            raise result.error
+
+
+def robocopy_bytes_copied(output: str) -> int | None:
+    """Bytes copied, from the summary robocopy prints when run with `/bytes`.
+
+    None if there's no summary, e.g. robocopy failed to start.
+    """
+    # "Bytes :  <total>  <copied>  <skipped>  <mismatch>  <failed>  <extras>"
+    match = re.search(r"^\s*Bytes\s*:\s*(\d+)\s+(\d+)", output, re.MULTILINE)
+    return int(match.group(2)) if match else None
+
+
+class TransferReport:
+    """Collects per-file transfer records for a session and summarizes them by label.
+
+    Durations are summed per file, so throughput reflects the speed of each
+    file's transfer rather than the wall-clock rate of concurrent transfers.
+    """
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.results: list[TransferResult] = []
+        self._lock = threading.Lock()
+
+    def add(self, results: Iterable[TransferResult], label: str | None = None) -> None:
+        "Add results, optionally overriding their labels."
+        results = list(results)
+        if label is not None:
+            for result in results:
+                result.label = label
+        with self._lock:
+            self.results.extend(results)
+
+    @staticmethod
+    def summarize(results: Sequence[TransferResult]) -> dict[str, Any]:
+        size = sum(r.size for r in results)
+        duration = sum(r.duration for r in results)
+        return {
+            "files": len(results),
+            "bytes": size,
+            "duration": round(duration, 3),
+            "throughput": round(size / duration) if duration else 0,
+            "retries": sum(r.retries for r in results),
+            "errors": sum(not r.ok for r in results),
+        }
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            results = list(self.results)
+        by_label: dict[str, list[TransferResult]] = {}
+        for result in results:
+            by_label.setdefault(result.label, []).append(result)
+        return {
+            "total": self.summarize(results),
+            "by_label": {
+                label: self.summarize(group) for label, group in by_label.items()
+            },
+        }
+
+    def write(self, path: str | pathlib.Path) -> pathlib.Path:
+        "Write summary and per-file records as JSON."
+        path = pathlib.Path(path)
+        with self._lock:
+            files = [r.to_dict() for r in self.results]
+        path.write_text(
+            json.dumps(
+                {
+                    "name": self.name,
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    **self.summary(),
+                    "files": files,
+                },
+                indent=2,
+            )
+        )
+        logger.info("Wrote transfer report to %s", path)
+        return path
+
+
+@dataclasses.dataclass
+class TreeProgress:
+    """Snapshot of how much of a directory tree has been copied."""
+
+    files_total: int = 0
+    bytes_total: int = 0
+    bytes_done: int = 0
+    remaining: list[pathlib.Path] = dataclasses.field(default_factory=list)
+    "Source files not yet completely copied."
+
+    @property
+    def bytes_remaining(self) -> int:
+        return self.bytes_total - self.bytes_done
+
+    @property
+    def complete(self) -> bool:
+        return not self.remaining
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files_total - len(self.remaining)}/{self.files_total} files, "
+            f"{self.bytes_done / 1e9:.1f}/{self.bytes_total / 1e9:.1f} GB copied"
+        )
+
+
+class ResumableTreeCopy:
+    """Copy a directory tree from this computer, keeping a per-file progress journal
+    so that an interrupted copy resumes from the last completed block.
+
+    - files whose source size or mtime changed since they were journaled are
+      copied again from the start
+    - a partial destination file is truncated to the last journaled block
+      before resuming
+    - `progress()` reports what remains without copying anything (e.g. after
+      copying by other means), using the journal where it's valid and
+      comparing file sizes otherwise
+    - the journal is written at most every `journal_interval_s` while copying,
+      and at the end, so a resumed copy repeats at most that interval's work
+
+    >>> copier = ResumableTreeCopy(src, dest, journal=dest.with_suffix('.json'))
+    >>> copier.run()  # re-run after an interruption to resume
+    """
+
+    def __init__(
+        self,
+        src: str | pathlib.Path,
+        dest: str | pathlib.Path,
+        journal: str | pathlib.Path,
+        block_size: int = 64 * 1024**2,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        journal_interval_s: float = 30,
+    ) -> None:
+        self.src = pathlib.Path(src)
+        self.dest = pathlib.Path(dest)
+        self.journal = pathlib.Path(journal)
+        self.block_size = block_size
+        self.max_workers = max_workers
+        self.journal_interval_s = journal_interval_s
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, int]] = {}
+        self._journal_saved = 0.0
+        self.results: list[TransferResult] = []
+
+    def load_journal(self) -> dict[str, dict[str, int]]:
+        try:
+            journal = json.loads(self.journal.read_text())
+        except (OSError, ValueError):
+            return {}
+        if journal.get("src") != self.src.as_posix():
+            return {}
+        return journal.get("files", {})
+
+    def save_journal(self, force: bool = True) -> None:
+        "Write the journal, or if not `force` only if `journal_interval_s` has passed."
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._journal_saved < self.journal_interval_s:
+                return
+            self._journal_saved = now
+            text = json.dumps(
+                {
+                    "src": self.src.as_posix(),
+                    "dest": self.dest.as_posix(),
+                    "files": self._entries,
+                },
+                indent=1,
+            )
+            tmp = self.journal.with_suffix(".tmp")
+            tmp.write_text(text)
+            tmp.replace(self.journal)
+
+    def source_files(self) -> dict[str, os.stat_result]:
+        return {
+            path.relative_to(self.src).as_posix(): path.stat()
+            for path in sorted(self.src.rglob("*"))
+            if path.is_file()
+        }
+
+    def copied_bytes(self, relpath: str, stat: os.stat_result) -> int:
+        "Bytes of `relpath` that are known to be copied already."
+        dest = self.dest / relpath
+        if not dest.exists():
+            return 0
+        dest_size = dest.stat().st_size
+        entry = self._entries.get(relpath)
+        if entry is None:
+            # no journal: only trust a destination file that's complete
+            return stat.st_size if dest_size == stat.st_size else 0
+        if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return 0
+        return min(entry["copied"], dest_size)
+
+    def progress(self) -> TreeProgress:
+        self._entries = self.load_journal()
+        progress = TreeProgress()
+        for relpath, stat in self.source_files().items():
+            copied = self.copied_bytes(relpath, stat)
+            progress.files_total += 1
+            progress.bytes_total += stat.st_size
+            progress.bytes_done += copied
+            if copied < stat.st_size:
+                progress.remaining.append(self.src / relpath)
+        return progress
+
+    def copy_one(self, relpath: str, stat: os.stat_result) -> TransferResult:
+        src, dest = self.src / relpath, self.dest / relpath
+        result = TransferResult(src=src, dest=dest)
+        t0 = time.perf_counter()
+        try:
+            offset = self.copied_bytes(relpath, stat)
+            offset -= offset % self.block_size if offset < stat.st_size else 0
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._entries[relpath] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "copied": offset,
+                }
+            self.save_journal(force=False)
+            if offset < stat.st_size:
+                if offset:
+                    logger.debug("Resuming %s at %d/%d B", src, offset, stat.st_size)
+                with open(src, "rb") as s, open(dest, "r+b" if offset else "wb") as d:
+                    d.truncate(offset)
+                    s.seek(offset)
+                    d.seek(offset)
+                    while block := s.read(self.block_size):
+                        d.write(block)
+                        d.flush()
+                        offset += len(block)
+                        result.size += len(block)
+                        with self._lock:
+                            self._entries[relpath]["copied"] = offset
+                        self.save_journal(force=False)
+                shutil.copystat(src, dest)
+        except OSError as exc:
+            result.error = exc
+        result.duration = time.perf_counter() - t0
+        return result
+
+    def run(self, check: bool = True) -> TreeProgress:
+        """Copy all files not already copied, then return the progress.
+
+        If `check`, the first error is raised after all files have been attempted.
+        """
+        self._entries = self.load_journal()
+        self.dest.mkdir(parents=True, exist_ok=True)
+        files = self.source_files()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="resumable"
+        ) as executor:
+            self.results = list(
+                executor.map(lambda item: self.copy_one(*item), files.items())
+            )
+        self.save_journal()
+        progress = self.progress()
+        logger.info("Copied %s -> %s: %s", self.src, self.dest, progress)
+        if check:
+            raise_first_error(self.results)
+        return progress
@@ -0,0 +1,56 @@
+"""Wait for stimulus scripts to finish, with bounded latency."""
+
+import threading
+import time
+from collections.abc import Iterable
+
+import np_logging
+from np_services import Startable
+
+logger = np_logging.getLogger(__name__)
+
+DEFAULT_MAX_LATENCY_S = 0.5
+"Longest time between a stim finishing and `wait_for_stims` returning."
+
+
+class WithStimLatency:
+    """Base for experiments, and the mixins that add stims to them, that wait for
+    stims to finish."""
+
+    stim_max_latency_s: float = DEFAULT_MAX_LATENCY_S
+    "Longest delay between a stim finishing and the workflow noticing."
+
+
+def wait_for_stims(
+    stims: Iterable[Startable],
+    max_latency_s: float = DEFAULT_MAX_LATENCY_S,
+    initial_interval_s: float = 0.05,
+    backoff_factor: float = 1.5,
+    timeout_s: float | None = None,
+    cancel: threading.Event | None = None,
+) -> float:
+    """Block until every stim's `is_ready_to_start()` is True.
+
+    Polling starts every `initial_interval_s` and backs off by `backoff_factor` up
+    to `max_latency_s`, so short stims are caught quickly and long ones aren't
+    polled more than necessary.
+
+    - raises `TimeoutError` after `timeout_s`, if specified
+    - returns early if `cancel` is set
+    - returns the time waited, in seconds
+    """
+    stims = tuple(stims)
+    cancel = cancel or threading.Event()
+    interval = min(initial_interval_s, max_latency_s)
+    t0 = time.monotonic()
+    while not all(stim.is_ready_to_start() for stim in stims):
+        elapsed = time.monotonic() - t0
+        if timeout_s is not None and elapsed > timeout_s:
+            raise TimeoutError(f"Stims did not finish within {timeout_s} s: {stims}")
+        if cancel.wait(interval):
+            logger.debug("Cancelled waiting for %s", stims)
+            return time.monotonic() - t0
+        interval = min(interval * backoff_factor, max_latency_s)
+    elapsed = time.monotonic() - t0
+    logger.debug("Stims finished after %.1f s: %s", elapsed, stims)
+    return elapsed
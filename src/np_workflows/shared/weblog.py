@@ -0,0 +1,176 @@
+"""Send records to the web log server without blocking the caller.
+
+`web(project_name)` is a drop-in for `np_logging.web(project_name)`: records are
+put on a bounded queue and passed to the web logger on a background thread,
+under the web logger's name. The web logger itself is created on that thread, on
+first use, and each project's logger is created once per session. If the queue
+is full, records are dropped and counted rather than waited on. Anything queued
+is flushed at exit.
+"""
+
+import atexit
+import functools
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections.abc import Callable
+
+import np_logging
+
+logger = np_logging.getLogger(__name__)
+
+DEFAULT_MAX_QUEUED = 10_000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_TIMEOUT_S = 5.0
+
+Target = logging.Logger | logging.Handler
+
+
+class BatchingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records, which a background thread passes to `target`.
+
+    - `target` may be a function returning the logger or handler, which is then
+      called on the background thread, before the first record is passed on
+    - records are taken off the queue up to `batch_size` at a time, but each is
+      still sent on its own by `target`'s handlers
+    - at most `max_queued` records are held: further records are dropped and
+      counted in `dropped`
+    - records are passed on under `target`'s name, if it's a logger, so they're
+      filtered by the server as if logged to it directly
+    - send errors are reported by `target`'s handlers (`Handler.handleError`), which
+      don't raise, so they aren't counted here
+    """
+
+    def __init__(
+        self,
+        target: Target | Callable[[], Target],
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        self.records: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=max_queued)
+        super().__init__(self.records)
+        self._target = target
+        self.batch_size = batch_size
+        self.sent = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="weblog", daemon=True)
+        self._thread.start()
+
+    @property
+    def target(self) -> Target:
+        "Resolved on first access, if given as a function."
+        if not isinstance(self._target, logging.Logger | logging.Handler):
+            self._target = self._target()
+        return self._target
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _batch(self) -> list[logging.LogRecord]:
+        batch = [self.records.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.records.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._batch()
+            try:
+                target = self.target
+            except Exception:
+                logger.debug("Failed to create web logger", exc_info=True)
+                self.dropped += len(batch)
+                for _ in batch:
+                    self.records.task_done()
+                continue
+            for record in batch:
+                try:
+                    self._send(target, record)
+                except Exception:
+                    logger.debug("Failed to pass on web log record", exc_info=True)
+                finally:
+                    self.records.task_done()
+
+    def _send(self, target: Target, record: logging.LogRecord) -> None:
+        if isinstance(target, logging.Logger):
+            if not target.isEnabledFor(record.levelno):
+                return
+            record.name = target.name
+        elif record.levelno < target.level:
+            return
+        target.handle(record)
+        self.sent += 1
+
+    def wait_until_sent(
+        self, timeout_s: float | None = DEFAULT_FLUSH_TIMEOUT_S
+    ) -> bool:
+        "Wait for queued records to be handled. Returns False on timeout."
+        deadline = None if timeout_s is None else time.monotonic() + timeout_s
+        with self.records.all_tasks_done:
+            while self.records.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.records.all_tasks_done.wait(remaining)
+        return True
+
+    def flush(self) -> None:
+        "Wait up to `DEFAULT_FLUSH_TIMEOUT_S` for queued records to be handled."
+        self.wait_until_sent()
+
+    def close(self) -> None:
+        if not self.wait_until_sent():
+            logger.warning(
+                "Web log records still queued at close: %d", self.records.qsize()
+            )
+        super().close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "sent": self.sent,
+            "queued": self.records.qsize(),
+            "dropped": self.dropped,
+        }
+
+
+_lock = threading.Lock()
+_web_loggers: dict[str, logging.Logger] = {}
+_handlers: list[BatchingQueueHandler] = []
+
+
+def web(project_name: str) -> logging.Logger:
+    """Like `np_logging.web`, but records are sent on a background thread.
+
+    The logger for each project is created once, and reused.
+    """
+    with _lock:
+        if (queued := _web_loggers.get(project_name)) is None:
+            handler = BatchingQueueHandler(
+                functools.partial(np_logging.web, project_name)
+            )
+            queued = logging.getLogger(f"{__name__}.{project_name}")
+            queued.addHandler(handler)
+            queued.propagate = False
+            # levels are checked against the web logger's, once it's created
+            queued.setLevel(logging.DEBUG)
+            atexit.register(handler.close)
+            _web_loggers[project_name] = queued
+            _handlers.append(handler)
+    return queued
+
+
+def stats() -> dict[str, int]:
+    "Counts of records sent, queued and dropped, summed over web loggers."
+    totals = {"sent": 0, "queued": 0, "dropped": 0}
+    for handler in _handlers:
+        for key, value in handler.stats().items():
+            totals[key] += value
+    return totals
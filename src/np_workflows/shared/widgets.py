@@ -1,11 +1,15 @@
+import concurrent.futures
+import contextlib
 import datetime
-import io
+import hashlib
+import json
 import logging
 import pathlib
 import re
 import threading
 import time
-from typing import Literal, NoReturn
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Literal, NoReturn
 
 import IPython
 import IPython.display
@@ -14,11 +18,49 @@ import np_config
 import np_logging
 import np_services
 import np_session
-import PIL.Image
-import PIL.ImageDraw
 
+import np_workflows.shared.cache as cache
+import np_workflows.shared.images as images
+import np_workflows.shared.mtrain_view as mtrain_view
 import np_workflows.shared.npxc as npxc
 
+if TYPE_CHECKING:
+    import PIL.Image
+
+__all__ = [
+    "ISI_TARGET_COLORS",
+    "ISICoords",
+    "ISISpaces",
+    "ISITargets",
+    "await_all_checkboxes",
+    "check_hardware_widget",
+    "check_mouse_widget",
+    "check_openephys_widget",
+    "check_widget",
+    "di_widget",
+    "dye_info_widget",
+    "dye_widget",
+    "elapsed_time_widget",
+    "finishing_checks_widget",
+    "global_state",
+    "insertion_notes_widget",
+    "isi_last_render_path",
+    "isi_map_path",
+    "isi_targets",
+    "isi_widget",
+    "mtrain_widget",
+    "photodoc_widget",
+    "pre_stim_check_widget",
+    "probe_depth_widget",
+    "probe_targeting_widget",
+    "quiet_mode_widget",
+    "render_isi_map",
+    "show_thumbnail",
+    "task_select_widget",
+    "user_and_mouse_widget",
+    "wheel_height_widget",
+]
+
 logger = np_logging.getLogger(__name__)
 
 np_logging.getLogger("Comm").propagate = False
@@ -65,9 +107,11 @@ def user_and_mouse_widget() -> tuple[np_session.User, np_session.Mouse]:
     console = ipw.Output()
     user_description = "User:"
     mouse_description = "Mouse:"
-    user_widget = ipw.Select(options=npxc.lims_user_ids, description=user_description)
+    user_widget = ipw.Select(
+        options=npxc.get_lims_user_ids(), description=user_description
+    )
     mouse_widget = ipw.Text(
-        value=str(npxc.default_mouse_id), description=mouse_description
+        value=str(npxc.get_default_mouse_id()), description=mouse_description
     )
     for widget, string in zip((user_widget, mouse_widget), ("user", "mouse")):
         if selected := global_state.get(f"selected_{string}"):
@@ -120,13 +164,11 @@ def mtrain_widget(
     labtracks_mouse_id: str | int | np_session.Mouse,
 ) -> IPython.display.DisplayHandle | None:
     """Displays a widget to view and edit MTrain regimen/stage for a mouse."""
-    if not isinstance(labtracks_mouse_id, np_session.Mouse):
-        mtrain = np_session.MTrain(labtracks_mouse_id)
-    else:
-        mtrain = labtracks_mouse_id.mtrain
+    mtrain = mtrain_view.get_view(labtracks_mouse_id)
+    mtrain.refresh()  # in case the stage was changed elsewhere
 
-    all_regimens = mtrain.get_all("regimens")
-    regimen_names = sorted(_["name"] for _ in all_regimens)
+    regimens = mtrain_view.get_regimens()
+    regimen_names = regimens.names
 
     widget = ipw.GridspecLayout(n_rows=4, n_columns=2)
 
@@ -150,11 +192,7 @@ def mtrain_widget(
 
     def on_regimen_change(change: dict):
         update_button.disabled = True
-        new_regimen_dict = [
-            regimen
-            for regimen in all_regimens
-            if regimen["name"] == regimen_dropdown.value
-        ][0]
+        new_regimen_dict = regimens.by_name[regimen_dropdown.value]
         stage_dropdown.options = sorted([_["name"] for _ in new_regimen_dict["stages"]])
         stage_dropdown.value = None
         stage_dropdown.stages = new_regimen_dict["stages"]
@@ -182,11 +220,11 @@ def mtrain_widget(
 
     def update_label_values() -> None:
         regimen_label.value = f'Regimen: {mtrain.regimen["name"]}'
-        stage_label.value = f'Stage: {mtrain.stage["name"]}'
+        stage_label.value = f"Stage: {mtrain.stage_name or 'not found in regimen'}"
 
     def update_dropdown_values() -> None:
         regimen_dropdown.value = mtrain.regimen["name"]
-        stage_dropdown.value = mtrain.stage["name"]
+        stage_dropdown.value = mtrain.stage_name
 
     def update_regimen_and_stage_in_mtrain(b):
         update_button.description = "Updating..."
@@ -195,9 +233,7 @@ def mtrain_widget(
         old_regimen_name = regimen_label.value
         old_stage_name = stage_label.value
 
-        new_regimen_dict = [
-            _ for _ in all_regimens if _["name"] == regimen_dropdown.value
-        ][0]
+        new_regimen_dict = regimens.by_name[regimen_dropdown.value]
         new_stage_dict = [
             _ for _ in stage_dropdown.stages if _["name"] == stage_dropdown.value
         ][0]
@@ -211,7 +247,7 @@ def mtrain_widget(
             if regimen_name_changed:
                 print(f'{old_regimen_name} changed to {mtrain.regimen["name"]}\n')
             if stage_name_changed or regimen_name_changed:
-                print(f'{old_stage_name} changed to {mtrain.stage["name"]}\n')
+                print(f"{old_stage_name} changed to {mtrain.stage_name}\n")
 
     update_button.on_click(update_regimen_and_stage_in_mtrain)
 
@@ -272,7 +308,7 @@ def check_mouse_widget() -> None:
         "Stabilization screw",
         (
             "Silicon oil applied"
-            if npxc.RIG.idx == 0
+            if npxc.get_rig().idx == 0
             else "Quickcast removed, agarose applied"
         ),
         "Tail cone down",
@@ -514,6 +550,31 @@ ISITargets = dict[
 ]
 
 
+def show_thumbnail(
+    future: concurrent.futures.Future[images.Thumbnail],
+    image: ipw.Image,
+    console: ipw.Output,
+    on_done: Callable[[], None] | None = None,
+) -> None:
+    "Update `image` when a thumbnail from `images.thumbnail_async` is ready."
+
+    def update(future: concurrent.futures.Future[images.Thumbnail]) -> None:
+        try:
+            thumbnail = future.result()
+        except Exception as exc:
+            with console:
+                print(f"Failed to load image: {exc!r}")
+        else:
+            image.format = thumbnail.format
+            image.value = thumbnail.data
+            image.layout.visibility = "visible"
+        finally:
+            if on_done is not None:
+                on_done()
+
+    future.add_done_callback(update)
+
+
 def isi_targets(
     labtracks_mouse_id: str | int | np_session.LIMS2MouseInfo,
 ) -> None | ISITargets:
@@ -529,25 +590,134 @@ def isi_targets(
     return isi[0]["targets"] if isi else None
 
 
+ISI_TARGET_COLORS = {
+    "insertion_targets": "red",
+    "intended_insertion": "yellow",
+    "actual_insertion": "blue",
+}
+
+
+def isi_map_path(
+    mouse_info: np_session.LIMS2MouseInfo, colormap: bool = False
+) -> pathlib.Path:
+    "ISI target map (or colormap overlay) image from lims."
+    key = "isi_image_overlay_path" if colormap else "target_map_image_path"
+    return np_config.normalize_path(mouse_info.isi_info[key])
+
+
+ISI_LAST_RENDER_MAX_AGE_S = 90 * 24 * 60 * 60
+"Last renders of mice not shown for this long are deleted."
+
+
+def isi_last_render_path(mouse_id: str | int, colormap: bool = False) -> pathlib.Path:
+    "Local copy of the most recent render for a mouse, shown while lims is checked."
+    kind = "colormap" if colormap else "target_map"
+    return cache.cache_dir("isi") / f"{mouse_id}_{kind}.png"
+
+
+def render_isi_map(
+    mouse_info: np_session.LIMS2MouseInfo, colormap: bool = False
+) -> concurrent.futures.Future[images.Thumbnail]:
+    """Render the ISI map with targets from lims drawn on, on a worker thread.
+
+    Renders are cached on local disk by (image path, mtime, targets, colormap), so
+    re-rendering an unchanged map doesn't read the image from the network share.
+    """
+    path = isi_map_path(mouse_info, colormap)
+    all_targets = isi_targets(mouse_info)
+    if not all_targets:
+        logger.debug(
+            "No ISI targets found for %r in lims, ISI experiment id %s",
+            mouse_info,
+            mouse_info.isi_id,
+        )
+
+    def draw_targets(img: "PIL.Image.Image") -> None:
+        import PIL.ImageDraw
+
+        draw = PIL.ImageDraw.Draw(img)
+        for targets, spaces in (all_targets or {}).items():
+            coords = spaces["image_space"]
+            if coords is None:
+                continue
+            draw.line(
+                [(_["x"], _["y"]) for _ in coords],
+                fill=ISI_TARGET_COLORS[targets],
+                width=3,
+            )
+
+    targets_hash = hashlib.sha256(
+        json.dumps(all_targets, sort_keys=True).encode()
+    ).hexdigest()
+    future = images.thumbnail_async(
+        path,
+        format="png",
+        draw=draw_targets,
+        draw_key=(targets_hash, colormap),
+        persist=True,
+    )
+
+    def save_last_render(
+        future: concurrent.futures.Future[images.Thumbnail],
+    ) -> None:
+        if future.exception() is None:
+            last_render = isi_last_render_path(mouse_info.np_id, colormap)
+            with contextlib.suppress(OSError):
+                last_render.write_bytes(future.result().data)
+            cache.prune(last_render.parent, max_age_s=ISI_LAST_RENDER_MAX_AGE_S)
+
+    future.add_done_callback(save_last_render)
+    return future
+
+
 def isi_widget(
     labtracks_mouse_id: str | int | np_session.LIMS2MouseInfo,
     colormap: bool = False,
 ) -> IPython.display.DisplayHandle | None:
     """Displays ISI target map from lims (contours only), or colormap overlay if
-    `show_colormap = True`."""
-    if not isinstance(labtracks_mouse_id, np_session.LIMS2MouseInfo):
-        mouse_info = np_session.LIMS2MouseInfo(labtracks_mouse_id)
-    else:
-        mouse_info = labtracks_mouse_id
-        mouse_info.fetch()  # refresh in case targets were updated recently
+    `show_colormap = True`.
 
-    if colormap:
-        key = "isi_image_overlay_path"
-    else:
-        key = "target_map_image_path"
+    If the map has been rendered before, the last render is shown immediately and
+    updated in the background if lims has changed.
+    """
+    mouse_id = (
+        labtracks_mouse_id.np_id
+        if isinstance(labtracks_mouse_id, np_session.LIMS2MouseInfo)
+        else labtracks_mouse_id
+    )
+    last_render = isi_last_render_path(mouse_id, colormap)
+    ## displaying img directly no longer works (due to jupyterlab 4.0?)
+    image = ipw.Image(format="png")
+    console = ipw.Output()
 
+    def get_mouse_info() -> np_session.LIMS2MouseInfo:
+        if not isinstance(labtracks_mouse_id, np_session.LIMS2MouseInfo):
+            return np_session.LIMS2MouseInfo(labtracks_mouse_id)
+        labtracks_mouse_id.fetch()  # refresh in case targets were updated recently
+        return labtracks_mouse_id
+
+    if last_render.exists():
+        image.value = last_render.read_bytes()
+        print(f"ISI map for {mouse_id} (last render: checking lims for updates)")
+
+        def refresh() -> None:
+            try:
+                thumbnail = render_isi_map(get_mouse_info(), colormap).result()
+            except Exception as exc:
+                with console:
+                    print(f"Failed to check lims for ISI updates: {exc!r}")
+                return
+            if thumbnail.data != image.value:
+                image.value = thumbnail.data
+                with console:
+                    print(f"ISI map updated from lims:\n{thumbnail.path}")
+
+        threading.Thread(target=refresh, name="isi_refresh", daemon=True).start()
+        return IPython.display.display(ipw.VBox([image, console]))
+
+    mouse_info = get_mouse_info()
     try:
-        lims_path = mouse_info.isi_info[key]
+        path = isi_map_path(mouse_info, colormap)
     except ValueError:
         print("Mouse is not in lims.")
         return
@@ -555,37 +725,12 @@ def isi_widget(
         print("No ISI map found for this mouse.")
         return
     except KeyError:
+        key = "isi_image_overlay_path" if colormap else "target_map_image_path"
         print(f"ISI info found for this mouse, but {key=!r} is missing.")
         return IPython.display.display(IPython.display.JSON(mouse_info.isi_info))
-    else:
-        path: pathlib.Path = np_config.normalize_path(lims_path)
-        print(f"ISI map found for {mouse_info.np_id}:\n{path}")
-        img = PIL.Image.open(path)
-        if all_targets := isi_targets(mouse_info):
-            colors = {
-                "insertion_targets": "red",
-                "intended_insertion": "yellow",
-                "actual_insertion": "blue",
-            }
-            for targets, spaces in all_targets.items():
-                coords = spaces["image_space"]
-                if coords is None:
-                    continue
-                draw = PIL.ImageDraw.Draw(img)
-                draw.line(
-                    [(_["x"], _["y"]) for _ in coords], fill=colors[targets], width=3
-                )
-        else:
-            logger.debug(
-                "No ISI targets found for %r in lims, ISI experiment id %s",
-                mouse_info,
-                mouse_info.isi_id,
-            )
-        ## displaying img directly no longer works (due to jupyterlab 4.0?)
-        # return IPython.display.display(img)
-        membuf = io.BytesIO()
-        img.save(membuf, format="png")
-        return IPython.display.display(ipw.VBox([ipw.Image(value=membuf.getvalue())]))
+    print(f"ISI map found for {mouse_info.np_id}:\n{path}")
+    show_thumbnail(render_isi_map(mouse_info, colormap), image, console)
+    return IPython.display.display(ipw.VBox([image, console]))
 
 
 def insertion_notes_widget(session: np_session.PipelineSession):
@@ -732,14 +877,20 @@ def photodoc_widget(img_name: str) -> IPython.display.DisplayHandle | None:
         button.disabled = True
         return npxc.photodoc(img_name)
 
-    def disp(img_path) -> None:
-        image.value = img_path.read_bytes()
-        image.layout.visibility = "visible"
+    def enable_button() -> None:
         button.button_style = "warning"
         button.description = "Re-capture"
         button.disabled = False
+
+    def disp(img_path: pathlib.Path) -> None:
         with console:
             print(img_path)
+        show_thumbnail(
+            images.thumbnail_async(img_path, format="jpeg"),
+            image,
+            console,
+            on_done=enable_button,
+        )
 
     def capture_and_display(*args):
         disp(capture())
@@ -0,0 +1,38 @@
+import os
+import pathlib
+import time
+
+import pytest
+
+pytest.importorskip("np_logging")
+
+from np_workflows.shared import cache
+
+
+def test_prune_deletes_expired_then_oldest_files(tmp_path: pathlib.Path) -> None:
+    now = time.time()
+    for age_days, name in enumerate(("new", "old", "older", "expired")):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 100)
+        mtime = now - age_days * 24 * 60 * 60
+        os.utime(path, (mtime, mtime))
+    deleted = cache.prune(tmp_path, max_bytes=150, max_age_s=2.5 * 24 * 60 * 60)
+    assert deleted == 3
+    assert [p.name for p in tmp_path.iterdir()] == ["new"]
+
+
+def test_snapshot_fallback_is_cached_for_ttl(tmp_path: pathlib.Path) -> None:
+    calls = []
+
+    def loader(key: str) -> dict[str, int]:
+        calls.append(key)
+        if len(calls) > 1:
+            raise OSError("unreachable")
+        return {"value": 1}
+
+    snapshot = tmp_path / "snapshot.json"
+    cache.TTLCache(loader, snapshot=snapshot).get("/config")
+    offline = cache.TTLCache(loader, ttl_s=60, snapshot=snapshot)
+    assert offline.get("/config") == {"value": 1}
+    assert offline.get("/config") == {"value": 1}
+    assert len(calls) == 2
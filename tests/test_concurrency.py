@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+pytest.importorskip("np_logging")
+
+from np_workflows.shared import concurrency
+
+
+def fail() -> None:
+    raise OSError("service unavailable")
+
+
+def test_dependents_run_after_dependencies() -> None:
+    order = []
+    lock = threading.Lock()
+
+    def task(key: str):
+        def run() -> None:
+            with lock:
+                order.append(key)
+
+        return run
+
+    timings = concurrency.run_with_dependencies(
+        {key: task(key) for key in "abc"},
+        dependencies={"b": ["a"], "c": ["b"]},
+    )
+    assert order == ["a", "b", "c"]
+    assert all(timing.ok for timing in timings.values())
+
+
+def test_failure_skips_dependents_two_deep() -> None:
+    timings = concurrency.run_with_dependencies(
+        {"a": fail, "b": lambda: None, "c": lambda: None},
+        dependencies={"b": ["a"], "c": ["b"]},
+    )
+    assert isinstance(timings["a"].error, OSError)
+    for key in "bc":
+        assert isinstance(timings[key].error, RuntimeError)
+        assert timings[key].start is None
+
+
+def test_circular_dependencies_raise() -> None:
+    with pytest.raises(ValueError, match="Circular"):
+        concurrency.run_with_dependencies(
+            {"a": lambda: None, "b": lambda: None},
+            dependencies={"a": ["b"], "b": ["a"]},
+        )
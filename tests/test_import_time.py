@@ -0,0 +1,73 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+IMPORT_BUDGET_MS = 100
+"Cumulative time `import np_workflows` may take, measured with `-X importtime`."
+
+HEAVY_MODULES = (
+    "np_services",
+    "np_session",
+    "np_config",
+    "ipywidgets",
+    "IPython",
+    "fabric",
+    "PIL",
+    "numpy",
+    "yaml",
+)
+"Must not be imported by `import np_workflows`, only on attribute access."
+
+
+def run(code: str, *args: str) -> subprocess.CompletedProcess:
+    "`code` in a fresh interpreter, with this one's import path."
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def imported_after(code: str) -> set[str]:
+    result = run(f"{code}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))")
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_import_is_lazy() -> None:
+    modules = imported_after("import np_workflows, np_workflows.shared")
+    assert not modules & set(HEAVY_MODULES)
+    assert not {m for m in modules if m.startswith("np_workflows.shared.")}
+
+
+def test_private_attribute_imports_nothing() -> None:
+    # e.g. IPython probing for display methods
+    modules = imported_after(
+        "import np_workflows\n"
+        "for module in (np_workflows, np_workflows.shared):\n"
+        "    assert not hasattr(module, '_ipython_canary_method_should_not_exist_')"
+    )
+    assert not modules & set(HEAVY_MODULES)
+    assert not {m for m in modules if m.startswith("np_workflows.shared.")}
+
+
+def test_import_time_budget() -> None:
+    result = run("import np_workflows", "-X", "importtime")
+    # "import time: self [us] | cumulative | imported package"
+    cumulative_us = next(
+        int(match.group(1))
+        for line in result.stderr.splitlines()
+        if (match := re.match(r"import time:\s+\d+ \|\s+(\d+) \| np_workflows$", line))
+    )
+    assert cumulative_us / 1e3 < IMPORT_BUDGET_MS
+
+
+def test_npxc_exports_lazy_attributes() -> None:
+    npxc = pytest.importorskip("np_workflows.shared.npxc")
+    assert set(npxc._LAZY_ATTRS) <= set(npxc.__all__)
@@ -0,0 +1,104 @@
+import pathlib
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(
+    0,
+    str(
+        pathlib.Path(__file__).parents[1]
+        / "src"
+        / "np_workflows"
+        / "shared"
+        / "camstim_scripts"
+    ),
+)
+import opto_waveforms  # noqa: E402
+
+
+@pytest.fixture
+def playback() -> tuple:
+    "Fake analog and digital output tasks from a short buffered run."
+    opto_waveforms.FakeTask.calls.clear()
+    waveforms = [np.ones((20,)), np.ones((50,)) * 0.5]
+    opto_waveforms.run_buffered(
+        levels=[1.0, 2.0, 1.5],
+        conditions=[0, 1, 0],
+        waveforms=waveforms,
+        isis=[0.01, 0.02, 0.01],
+        sampleRate=1000.0,
+        AnalogOutput=opto_waveforms.FakeAnalogOutput,
+        DigitalOutput=opto_waveforms.FakeDigitalOutput,
+    )
+    tasks = {type(task): task for task, _ in opto_waveforms.FakeTask.calls}
+    return (
+        tasks[opto_waveforms.FakeAnalogOutput],
+        tasks[opto_waveforms.FakeDigitalOutput],
+    )
+
+
+def test_buffered_clocks_and_buffers(playback: tuple) -> None:
+    ao, do = playback
+    assert ao.clock_source is None
+    assert do.clock_source == "/Dev1/ao/SampleClock"
+    assert ao.mode == do.mode == "finite"
+    assert ao.sample_rate == do.sample_rate == 1000.0
+    (_, ao_data), (_, do_data) = ao.written[0], do.written[0]
+    assert len(ao.written) == len(do.written) == 1
+    assert ao.buffer_size == ao_data.size == len(do_data) == do.buffer_size
+
+
+def test_buffered_output_ends_with_sweep_off(playback: tuple) -> None:
+    ao, do = playback
+    do_data = do.written[0][1]
+    assert (do_data[-1] == opto_waveforms.SWEEP_OFF).all()
+    assert ao.written[0][1][-1] == 0
+    assert (do_data[0] == opto_waveforms.SWEEP_ON).all()
+    assert len(opto_waveforms.onset_times(do_data, 1000.0)) == 3
+
+
+def test_buffered_call_order(playback: tuple) -> None:
+    ao, do = playback
+    calls = [
+        ("ao" if task is ao else "do", name)
+        for task, name in opto_waveforms.FakeTask.calls
+        if name != "cfg_sample_clock"
+    ]
+    # both buffers are written before either task starts, and the digital output
+    # (slaved to the analog clock) starts first
+    assert calls[:4] == [
+        ("do", "write"),
+        ("ao", "write"),
+        ("do", "start"),
+        ("ao", "start"),
+    ]
+    # tasks are only cleared once they've generated every sample
+    assert calls.index(("ao", "clear")) > calls.index(("ao", "wait_until_done"))
+    assert calls.index(("do", "clear")) > calls.index(("do", "wait_until_done"))
+    assert ao.done and do.done and ao.cleared and do.cleared
+    assert all(t is None for t, _ in ao.written + do.written)
+
+
+def test_render_sequence_matches_loop_timing() -> None:
+    waveforms = [np.ones((20,)), np.ones((50,)) * 0.5]
+    isis = [0.03, 0.06, 0.03]
+    ao, do, onsets = opto_waveforms.render_sequence(
+        [1.0, 2.0, 1.5], [0, 1, 0], waveforms, isis, sampleRate=1000.0, lead_in_s=0.005
+    )
+    # onset to onset is the ISI, with each waveform playing during it
+    assert list(onsets) == [5, 35, 95]
+    assert np.allclose(np.diff(opto_waveforms.onset_times(do, 1000.0)), isis[:-1])
+    assert ao[35:85].tolist() == [1.0] * 50
+    # one short STIM_ON pulse per trial, not held for the whole waveform
+    stim_on = (do == opto_waveforms.STIM_ON).all(axis=1)
+    assert np.flatnonzero(stim_on).tolist() == [5, 35, 95]
+    assert ao.size == 95 + 30 + 1
+
+
+def test_render_sequence_waits_for_long_waveforms() -> None:
+    _, _, onsets = opto_waveforms.render_sequence(
+        [1.0, 1.0], [0, 0], [np.ones((100,))], [0.03, 0.03], 1000.0, lead_in_s=0
+    )
+    assert list(onsets) == [0, 100]
@@ -0,0 +1,66 @@
+import types
+
+import pytest
+
+pytest.importorskip("np_logging")
+
+from np_workflows.shared import profiling
+
+
+class Base:
+    @classmethod
+    def initialize(cls) -> str:
+        return cls.__name__
+
+    @staticmethod
+    def test() -> str:
+        return "test"
+
+
+class Sub(Base):
+    @classmethod
+    def start(cls) -> str:
+        return cls.__name__
+
+
+def test_classmethods_bind_subclass_and_are_restored() -> None:
+    profiler = profiling.Profiler()
+    before = dict(vars(Sub))
+    profiling.instrument_services(profiler, [Sub])
+    assert Sub.initialize() == "Sub"
+    assert Sub.start() == "Sub"
+    assert Sub.test() == "test"
+    assert Base.initialize() == "Base"
+    assert [e["name"] for e in profiler.events] == [
+        "Sub.initialize",
+        "Sub.start",
+        "Sub.test",
+    ]
+
+    profiling.uninstrument_services([Sub])
+    assert dict(vars(Sub)) == before
+    assert "initialize" not in vars(Sub)
+    assert Sub.initialize() == "Sub"
+
+
+def test_base_and_subclass_instrumented_together() -> None:
+    original = vars(Base)["initialize"]
+    profiler = profiling.Profiler()
+    profiling.instrument_services(profiler, [Base, Sub])
+    profiling.instrument_services(profiler, [Base, Sub])  # re-instrumenting
+    assert Sub.initialize() == "Sub"
+    assert [e["name"] for e in profiler.events] == ["Sub.initialize"]
+    profiling.uninstrument_services([Base, Sub])
+    assert vars(Base)["initialize"] is original
+    assert "initialize" not in vars(Sub)
+
+
+def test_module_service() -> None:
+    service = types.SimpleNamespace(initialize=lambda: "ok")
+    original = service.initialize
+    profiler = profiling.Profiler()
+    profiling.instrument_services(profiler, [service])
+    assert service.initialize() == "ok"
+    assert len(profiler.events) == 1
+    profiling.uninstrument_services([service])
+    assert service.initialize is original
@@ -0,0 +1,148 @@
+import pathlib
+import random
+import time
+
+import pytest
+
+yaml = pytest.importorskip("yaml")
+ts = pytest.importorskip("np_workflows.experiments.dynamic_routing.tracked_sessions")
+
+SCAN_BUDGET_S = 1.0
+"Scanning a 10k-session file: yaml.safe_load took ~2.4 s, the scan ~25 ms."
+
+TEXT = """\
+ephys:
+  DynamicRouting:
+    - //allen/DRpilot/DRpilot_1_20230101:
+        ephys_day: 1
+    - //allen/DRpilot/DRpilot_2_20230102
+  TempletonPilotSession:
+    - //allen/templeton/T_3_20230103:
+        session_kwargs:
+          is_task: false
+behavior_with_sync:
+  DynamicRouting:
+  # a comment
+  - //allen/DRpilot/DRpilot_4_20230104:
+      ephys_day: 2
+  - '//allen/DRpilot/DRpilot_5_20230105'
+"""
+
+
+def old_existing_sessions(text: str) -> set[str]:
+    "As before the index: every dict entry's path, from a full yaml load."
+    paths = set()
+    for project_data in (yaml.safe_load(text) or {}).values():
+        if not isinstance(project_data, dict):
+            continue
+        for sessions in project_data.values():
+            if not isinstance(sessions, list):
+                continue
+            for session in sessions:
+                if isinstance(session, dict):
+                    paths.update(session.keys())
+    return paths
+
+
+def old_insert(text: str, new: list[ts.NewSession]) -> str:
+    "As before the index: one str.find splice per session."
+    for session in new:
+        if session.session_type == "ephys":
+            ephys_stop = text.find("behavior_with_sync:")
+            if session.project == "TempletonPilotSession":
+                stop = ephys_stop
+            else:
+                stop = text[:ephys_stop].find("TempletonPilotSession:")
+        else:
+            stop = len(text)
+        text = text[:stop] + session.text + (text[stop:] if stop else "\n")
+    return text
+
+
+def new_session(session_type: str, project: str, path: str) -> ts.NewSession:
+    indent = " " * 4
+    return ts.NewSession(
+        session_type=session_type,
+        project=project,
+        path=path,
+        snippet=f"\n{indent}- {path}:\n{indent * 2}ephys_day: 1\n",
+    )
+
+
+NEW = [
+    new_session("ephys", "DynamicRouting", "//allen/DRpilot/new_1"),
+    new_session("ephys", "TempletonPilotSession", "//allen/templeton/new_2"),
+    new_session("behavior_with_sync", "DynamicRouting", "//allen/DRpilot/new_3"),
+    new_session("ephys", "DynamicRouting", "//allen/DRpilot/new_4"),
+    new_session("ephys", "TempletonPilotSession", "//allen/templeton/new_5"),
+]
+
+
+def synthetic_file(num_sessions: int) -> str:
+    lines = ["ephys:", "  DynamicRouting:"]
+    for i in range(num_sessions):
+        if i == num_sessions // 3:
+            lines.append("  TempletonPilotSession:")
+        elif i == 2 * num_sessions // 3:
+            lines += ["behavior_with_sync:", "  DynamicRouting:"]
+        lines += [
+            f"    - //allen/DRpilot/mouse_{i}_{random.randrange(10**6)}:",
+            f"        ephys_day: {i % 4}",
+            "        session_kwargs:",
+            "          is_task: true",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def test_scan_finds_items_under_or_level_with_project() -> None:
+    sessions, behavior_offset, templeton_offset = ts.scan(TEXT)
+    assert sessions == {
+        "//allen/DRpilot/DRpilot_1_20230101",
+        "//allen/DRpilot/DRpilot_2_20230102",
+        "//allen/templeton/T_3_20230103",
+        "//allen/DRpilot/DRpilot_4_20230104",
+        "//allen/DRpilot/DRpilot_5_20230105",
+    }
+    assert sessions >= old_existing_sessions(TEXT)
+    assert TEXT[behavior_offset:].startswith(ts.BEHAVIOR_WITH_SYNC)
+    assert TEXT[templeton_offset:].startswith(ts.TEMPLETON)
+
+
+def test_add_sessions_matches_old_splice(tmp_path: pathlib.Path) -> None:
+    text = synthetic_file(30)
+    path = tmp_path / "tracked_sessions.yaml"
+    path.write_text(text)
+    ts.add_sessions(path, NEW[:2])
+    ts.add_sessions(path, NEW[2:])  # with the index updated in place
+    updated = path.read_text()
+    assert updated == old_insert(text, NEW)
+    assert ts.get_existing_sessions(path) == old_existing_sessions(updated)
+    cached = ts.get_index(path)
+    ts._indexes.clear()
+    assert ts.get_index(path) == cached  # as if re-scanned
+    with pytest.raises(ValueError, match="already in"):
+        ts.add_sessions(path, NEW[:1])
+
+
+def test_insert_matches_old_splice_on_synthetic_file() -> None:
+    text = synthetic_file(300)
+    sessions, behavior_offset, templeton_offset = ts.scan(text)
+    index = ts.TrackedSessionsIndex(
+        mtime_ns=0,
+        size=0,
+        sessions=frozenset(sessions),
+        behavior_with_sync_offset=behavior_offset,
+        templeton_offset=templeton_offset,
+        length=len(text),
+    )
+    assert ts.insert(text, index, NEW) == old_insert(text, NEW)
+    assert sessions == old_existing_sessions(text)
+
+
+def test_scan_10k_sessions_benchmark() -> None:
+    text = synthetic_file(10_000)
+    start = time.perf_counter()
+    sessions, *_ = ts.scan(text)
+    elapsed = time.perf_counter() - start
+    assert len(sessions) == 10_000
+    assert elapsed < SCAN_BUDGET_S
@@ -0,0 +1,71 @@
+import pathlib
+
+import pytest
+
+pytest.importorskip("np_logging")
+
+from np_workflows.shared import transfer
+
+
+def test_copy_file_retries_on_checksum_mismatch(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"data" * 1000)
+    digests = iter(["corrupt"])
+    file_checksum = transfer.checksum.file_checksum
+    monkeypatch.setattr(
+        transfer.checksum,
+        "file_checksum",
+        lambda *args: next(digests, None) or file_checksum(*args),
+    )
+    result = transfer.copy_file(src, tmp_path / "dest.bin")
+    assert result.ok
+    assert result.retries == 1
+    assert (tmp_path / "dest.bin").read_bytes() == src.read_bytes()
+
+
+def test_transfer_files_rejects_colliding_destinations(
+    tmp_path: pathlib.Path,
+) -> None:
+    sources = [tmp_path / "a.pkl", tmp_path / "b.pkl"]
+    for src in sources:
+        src.write_bytes(src.name.encode())
+    dest = tmp_path / "session.behavior.pkl"
+    with pytest.raises(ValueError, match="would be copied to"):
+        transfer.transfer_files([(src, dest) for src in sources])
+    assert not dest.exists()
+
+
+def test_resumable_copy_batches_journal_writes(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    for name in ("a.dat", "sub/b.dat"):
+        (src / name).write_bytes(b"x" * 4096)
+    copier = transfer.ResumableTreeCopy(
+        src, tmp_path / "dest", tmp_path / "journal.json", block_size=256
+    )
+    writes = []
+    replace = pathlib.Path.replace
+    monkeypatch.setattr(
+        pathlib.Path,
+        "replace",
+        lambda self, target: writes.append(target) or replace(self, target),
+    )
+    assert copier.run().complete
+    # once while copying (the first block) and once at the end, not per block
+    assert len(writes) == 2
+    assert (tmp_path / "dest" / "sub" / "b.dat").read_bytes() == b"x" * 4096
+
+
+def test_robocopy_bytes_copied() -> None:
+    output = """
+               Total    Copied   Skipped  Mismatch    FAILED    Extras
+    Dirs :         3         1         2         0         0         0
+   Files :        12         4         8         0         0         0
+   Bytes :  52428800  10485760  41943040         0         0         0
+"""
+    assert transfer.robocopy_bytes_copied(output) == 10485760
+    assert transfer.robocopy_bytes_copied("ERROR 2 (0x00000002)") is None
@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+
+pytest.importorskip("np_logging")
+
+from np_workflows.shared import weblog
+
+
+class Capture(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def test_records_keep_the_web_logger_name() -> None:
+    target = logging.getLogger("web.test_weblog")
+    target.propagate = False
+    target.setLevel(logging.INFO)
+    capture = Capture()
+    target.addHandler(capture)
+    handler = weblog.BatchingQueueHandler(target)
+    queued = logging.getLogger(f"{weblog.__name__}.{target.name}")
+    queued.propagate = False
+    queued.setLevel(logging.INFO)
+    queued.addHandler(handler)
+    try:
+        queued.info("started %s", "session")
+        assert handler.wait_until_sent(timeout_s=5)
+    finally:
+        queued.removeHandler(handler)
+        target.removeHandler(capture)
+    assert [r.name for r in capture.records] == ["web.test_weblog"]
+    assert capture.records[0].getMessage() == "started session"
+    assert handler.stats() == {"sent": 1, "queued": 0, "dropped": 0}
+
+
+def test_web_loggers_are_created_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    created = []
+
+    def np_logging_web(project_name: str) -> logging.Logger:
+        created.append(project_name)
+        target = logging.getLogger(f"web.{project_name}")
+        target.propagate = False
+        target.setLevel(logging.INFO)
+        return target
+
+    monkeypatch.setattr(weblog.np_logging, "web", np_logging_web)
+    queued = weblog.web("test_weblog_once")
+    assert weblog.web("test_weblog_once") is queued
+    assert created == []  # not until there's a record to send
+    queued.info("started")
+    queued.debug("below the web logger's level")
+    handler = queued.handlers[0]
+    assert isinstance(handler, weblog.BatchingQueueHandler)
+    assert handler.wait_until_sent(timeout_s=5)
+    assert created == ["test_weblog_once"]
+    assert handler.stats() == {"sent": 1, "queued": 0, "dropped": 0}